@@ -23,6 +23,19 @@ class MultiStageWorker(ProgressReporter):
             self._progress_update(1, stage=1)
 
 
+class CombinedMultiStageWorker(MultiStageWorker):
+    """ same work, but both stages are shown by a single bar, the main computation takes 4/5 of it. """
+    _pg_combined = True
+
+    def __init__(self, n_jobs_init, n_jobs):
+        self.n_jobs_init = n_jobs_init
+        self.n_jobs = n_jobs
+        self._progress_register(self.n_jobs_init, description='initializing', stage=0, weight=1)
+        self._progress_register(self.n_jobs, description='main computation', stage=1, weight=4)
+
+
 if __name__ == '__main__':
     w = MultiStageWorker(50, 100)
     w.work()
+    w = CombinedMultiStageWorker(50, 100)
+    w.work()
@@ -58,6 +58,30 @@ This is just the dictionary key to the underlying process:
                 job()
                 self._progress_update(1, stage=1)
 
+Setting the attribute **_pg_combined = True** on a reporter shows all of its stages in a single bar,
+each stage taking the share given by the **weight** argument of **_progress_register**. The bar
+shows the description of the stage updated last.
+
+Stages can be nested, also across reporters, e.g. a featurization inside a clustering inside a
+model fit. The progress of a child stage flows into its parent stage, weighted by the amount of
+work of the parent the child accounts for:
+
+.. code:: python
+
+    fit = ProgressReporter_()
+    ticker = fit.register(10, description='fit')
+    # featurization is 4 of the 10 units of work of the fit
+    featurizer.register(len(X), description='featurize', parent=ticker, weight=4)
+
+Classes defining __slots__ without a __dict__ derive from **ProgressReporterMixIn** instead, which
+adds nothing to the instance layout, and declare the slot **_progress_state**, which holds the state of
+the reporter:
+
+.. code:: python
+
+    class SlottedWorker(ProgressReporterMixIn):
+        __slots__ = ('n_jobs', '_progress_state')
+
 Since version 2.0 there is also a version of the this class suitable for compositions. Note that
 
 .. code:: python
@@ -71,9 +95,49 @@ Since version 2.0 there is also a version of the this class suitable for composi
                 pg.update(50)
                 # ...
 
-"""
-from .reporter import ProgressReporter, ProgressReporter_
+Loops over an iterable can be counted by **iterate** (or **_progress_iterate**), which registers the
+stage with the length of the iterable and finishes it, once the iterable is exhausted. The items are
+counted by the loop of the progress bar, so callbacks of the stage are only called on redraws:
 
-from ._version import get_versions
-__version__ = get_versions()['version']
-del get_versions
+.. code:: python
+
+    for batch in pg.iterate(batches, description='fit'):
+        ...
+
+Progress of all reporters can be hidden at once by calling
+**progress_reporter.set_show_progress(False)** or by setting the environment variable
+**PROGRESS_REPORTER_DISABLE=1**. Updates of hidden reporters return immediately.
+
+Jupyter widgets are used to draw the progress, if a notebook kernel with ipywidgets is detected.
+This can be overridden by **progress_reporter.set_notebook_mode(True/False)** or by the environment
+variable **PROGRESS_REPORTER_NOTEBOOK=1/0**.
+
+Where progress is collected from logs, e.g. on a batch cluster, it can be written as JSON lines
+events instead of being drawn, by **progress_reporter.set_output('jsonl')** (or an instance of
+progress_reporter.jsonl.JSONLinesOutput to choose the file), by the environment variable
+**PROGRESS_REPORTER_OUTPUT=jsonl** or for a single reporter by assigning its **_progress_output**.
+
+The progress of all active stages can be exported to Prometheus, either written to a file for the
+textfile collector of the node exporter or served over HTTP, see progress_reporter.prometheus.
+
+Stages, which run many times, can start with the rate of their earlier runs, so their ETA is
+meaningful from the start: **progress_reporter.set_history(path)** or the environment variable
+**PROGRESS_REPORTER_HISTORY=path** records the rates of finished stages, see progress_reporter.history.
+
+"""
+from .reporter import (ProgressReporter, ProgressReporter_, ProgressReporterMixIn, set_history, set_output,
+                       set_show_progress, set_notebook_mode)
+
+try:
+    # written by setup.py into builds and source distributions.
+    from ._static_version import __version__
+except ImportError:
+    def __getattr__(name):
+        # In development checkouts the version is determined on first access, because versioneer
+        # has to invoke git, which would slow down importing this package.
+        global __version__
+        if name == '__version__':
+            from ._version import get_versions
+            __version__ = get_versions()['version']
+            return __version__
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
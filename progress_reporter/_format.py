@@ -0,0 +1,272 @@
+"""
+Compiled ``bar_format`` templates.
+
+``tqdm.format_meter`` splits the bar_format, formats every available statistic and
+interpolates the template on each redraw. A :class:`CompiledMeter` parses the template
+once and on redraw only computes the statistics referenced by it.
+"""
+from functools import partial
+from operator import itemgetter
+from string import Formatter
+
+from ._vendor.tqdm import tqdm
+from ._vendor.tqdm._utils import RE_ANSI
+
+__all__ = ['CompiledMeter', 'compile_meter']
+
+_DEFAULT_FORMAT = '{l_bar}{bar}{r_bar}'
+
+# names which can be used in a bar_format (besides 'bar').
+_FIELDS = frozenset(('n', 'n_fmt', 'total', 'total_fmt', 'percentage', 'rate', 'rate_fmt',
+                     'rate_noinv', 'rate_noinv_fmt', 'rate_inv', 'rate_inv_fmt', 'elapsed',
+                     'remaining', 'desc', 'postfix', 'l_bar', 'r_bar'))
+
+_CONVERSIONS = {None: None, 's': str, 'r': repr, 'a': ascii}
+
+# (full block, blocks for the fractional part, resolution)
+_ASCII_BLOCKS = ('#', (' ', ) + tuple(chr(48 + i) for i in range(1, 10)), 10)
+_UNICODE_BLOCKS = (chr(0x2588), (' ', ) + tuple(chr(0x2590 - i) for i in range(1, 8)), 8)
+
+_compiled = {}
+_MAX_COMPILED = 128
+
+
+def compile_meter(bar_format):
+    """ returns the (cached) CompiledMeter of the given bar_format (None for the default format). """
+    try:
+        return _compiled[bar_format]
+    except KeyError:
+        pass
+    if len(_compiled) >= _MAX_COMPILED:
+        _compiled.clear()
+    meter = _compiled[bar_format] = CompiledMeter(bar_format)
+    return meter
+
+
+def _parse(fmt):
+    # splits fmt into literal strings and (name, conversion, format_spec) tuples.
+    # returns None, if the format uses features, we leave to str.format.
+    parts = []
+    for literal, name, spec, conversion in Formatter().parse(fmt):
+        if literal:
+            parts.append(literal)
+        if name is None:
+            continue
+        if name not in _FIELDS or '{' in spec or conversion not in _CONVERSIONS:
+            return None
+        parts.append((name, _CONVERSIONS[conversion], spec))
+    return tuple(parts)
+
+
+def _render(parts, values):
+    out = []
+    for part in parts:
+        if part.__class__ is str:
+            out.append(part)
+        else:
+            name, conversion, spec = part
+            value = values[name]
+            if conversion is not None:
+                value = conversion(value)
+            out.append(format(value, spec))
+    return ''.join(out)
+
+
+def _compile(parts):
+    # returns a function rendering the parts from a dict of values.
+    if len(parts) == 1:
+        part = parts[0]
+        if part.__class__ is str:
+            return lambda values: part
+        name, conversion, spec = part
+        if conversion is None and not spec:
+            return itemgetter(name)
+    return partial(_render, parts)
+
+
+_intervals = {}
+
+
+def _format_interval(t):
+    # tqdm.format_interval, cached per second. Redraws within the same second share the string.
+    t = int(t)
+    try:
+        return _intervals[t]
+    except KeyError:
+        pass
+    if len(_intervals) >= 4096:
+        _intervals.clear()
+    s = _intervals[t] = tqdm.format_interval(t)
+    return s
+
+
+def _display_len(s):
+    return len(RE_ANSI.sub('', s)) if '\x1b' in s else len(s)
+
+
+class _Template(object):
+    # a parsed bar_format: either whole (no {bar}) or the parts left and right of the bar,
+    # each compiled to a function of the dict of values.
+    __slots__ = ('whole', 'left', 'right', 'uses', 'valid')
+
+    def __init__(self, fmt):
+        self.whole = self.left = self.right = None
+        pieces = fmt.split('{bar}')
+        parsed = tuple(_parse(p) for p in pieces) if len(pieces) <= 2 else (None, )
+        self.valid = all(p is not None for p in parsed)
+        if not self.valid:
+            return
+        self.uses = frozenset(part[0] for p in parsed for part in p if part.__class__ is not str)
+        if len(parsed) == 1:
+            self.whole = _compile(parsed[0])
+        else:
+            self.left, self.right = _compile(parsed[0]), _compile(parsed[1])
+
+
+class CompiledMeter(object):
+    """ Renders progress meters like ``tqdm.format_meter`` for a fixed bar_format.
+
+    The template is parsed once and static segments are kept. On every call only the
+    statistics referenced by the template are computed, e.g. the inverse rate is only
+    formatted, if the template contains {rate_inv_fmt}. Templates using features beyond
+    plain field names (e.g. nested format specs) are rendered by tqdm.format_meter.
+
+    Parameters
+    ----------
+    bar_format : str or None
+        the bar_format of a tqdm progress bar, None for the default format.
+    """
+    __slots__ = ('bar_format', '_templates')
+
+    def __init__(self, bar_format):
+        self.bar_format = bar_format
+        fmt = bar_format or _DEFAULT_FORMAT
+        # tqdm removes a trailing ': ' after an empty {desc}, so there is a template with and without desc.
+        self._templates = (_Template(fmt.replace('{desc}: ', '')), _Template(fmt))
+
+    def __call__(self, n, total, elapsed, ncols=None, prefix='', ascii=False, unit='it',
+                 unit_scale=False, rate=None, postfix=None, unit_divisor=1000):
+        """ same as tqdm.format_meter (with the bar_format of this meter). """
+        template = self._templates[bool(prefix)]
+        if not template.valid or ncols == 0:
+            return tqdm.format_meter(n, total, elapsed, ncols, prefix, ascii, unit, unit_scale,
+                                     rate, self.bar_format, postfix, unit_divisor)
+
+        if total and n > total:
+            total = None
+        if unit_scale and unit_scale not in (True, 1):
+            total *= unit_scale
+            n *= unit_scale
+            if rate:
+                rate *= unit_scale
+            unit_scale = False
+
+        format_sizeof = tqdm.format_sizeof
+        if rate is None and elapsed:
+            rate = n / elapsed
+        inv_rate = 1 / rate if rate else None
+        try:
+            postfix = ', ' + postfix if postfix else ''
+        except TypeError:
+            pass
+
+        if not total:
+            # no bar, bar_format is ignored
+            rate_fmt = _rate_fmt(rate, inv_rate, unit, unit_scale)
+            n_fmt = format_sizeof(n, divisor=unit_divisor) if unit_scale else str(n)
+            return ((prefix + ": ") if prefix else '') + '{0}{1} [{2}, {3}{4}]'.format(
+                n_fmt, unit, _format_interval(elapsed), rate_fmt, postfix)
+
+        uses = template.uses
+        frac = n / total
+        percentage = frac * 100
+        values = {'n': n, 'total': total, 'percentage': percentage, 'rate_noinv': rate,
+                  'rate_inv': inv_rate, 'desc': prefix or '', 'postfix': postfix}
+        if 'rate' in uses:
+            values['rate'] = inv_rate if inv_rate and inv_rate > 1 else rate
+        if 'rate_noinv_fmt' in uses:
+            values['rate_noinv_fmt'] = _rate_noinv_fmt(rate, unit, unit_scale)
+        if 'rate_inv_fmt' in uses:
+            values['rate_inv_fmt'] = _rate_inv_fmt(inv_rate, unit, unit_scale)
+        r_bar = 'r_bar' in uses
+        if r_bar or 'rate_fmt' in uses:
+            values['rate_fmt'] = _rate_fmt(rate, inv_rate, unit, unit_scale)
+        if r_bar or 'n_fmt' in uses:
+            values['n_fmt'] = format_sizeof(n, divisor=unit_divisor) if unit_scale else str(n)
+        if r_bar or 'total_fmt' in uses:
+            values['total_fmt'] = format_sizeof(total, divisor=unit_divisor) if unit_scale else str(total)
+        if r_bar or 'elapsed' in uses:
+            values['elapsed'] = _format_interval(elapsed)
+        if r_bar or 'remaining' in uses:
+            values['remaining'] = _format_interval((total - n) / rate) if rate else '?'
+        if 'l_bar' in uses:
+            if prefix:
+                l_bar = prefix if prefix[-2:] == ": " else prefix + ": "
+            else:
+                l_bar = ''
+            values['l_bar'] = l_bar + '{0:3.0f}%|'.format(percentage)
+        if r_bar:
+            values['r_bar'] = '| {0}/{1} [{2}<{3}, {4}{5}]'.format(
+                values['n_fmt'], values['total_fmt'], values['elapsed'], values['remaining'],
+                values['rate_fmt'], postfix)
+
+        if template.whole is not None:
+            return template.whole(values)
+        l_bar = template.left(values)
+        r_bar = template.right(values)
+
+        n_bars = max(1, ncols - _display_len(l_bar + r_bar)) if ncols else 10
+        block, frac_blocks, resolution = _ASCII_BLOCKS if ascii else _UNICODE_BLOCKS
+        bar_length, frac_bar_length = divmod(int(frac * n_bars * resolution), resolution)
+        if bar_length < n_bars:
+            bar = block * bar_length + frac_blocks[frac_bar_length] + ' ' * max(n_bars - bar_length - 1, 0)
+        else:
+            bar = block * bar_length + ' ' * max(n_bars - bar_length, 0)
+        return l_bar + bar + r_bar
+
+
+def _rate_noinv_fmt(rate, unit, unit_scale):
+    return ((tqdm.format_sizeof(rate) if unit_scale else '{0:5.2f}'.format(rate))
+            if rate else '?') + unit + '/s'
+
+
+def _rate_inv_fmt(inv_rate, unit, unit_scale):
+    return ((tqdm.format_sizeof(inv_rate) if unit_scale else '{0:5.2f}'.format(inv_rate))
+            if inv_rate else '?') + 's/' + unit
+
+
+def _rate_fmt(rate, inv_rate, unit, unit_scale):
+    if inv_rate and inv_rate > 1:
+        return _rate_inv_fmt(inv_rate, unit, unit_scale)
+    return _rate_noinv_fmt(rate, unit, unit_scale)
+
+
+class CompiledMeterMixin(object):
+    """ Mixin for tqdm subclasses drawing their meter with the CompiledMeter of their bar_format.
+
+    If an estimator (see progress_reporter.estimators) is assigned to the bar, it observes every
+    redraw and determines the rate shown, instead of the smoothed rate of tqdm.
+    """
+
+    _meter = None
+    estimator = None
+
+    def _rate(self):
+        # items per second, None if unknown.
+        if self.estimator is not None:
+            return self.estimator.rate()
+        return 1 / self.avg_time if self.avg_time else None
+
+    def __repr__(self, elapsed=None):
+        meter = self._meter
+        if meter is None or meter.bar_format != self.bar_format:
+            meter = self._meter = compile_meter(self.bar_format)
+        if self.estimator is not None:
+            self.estimator.update(self.n, self._time())
+        return meter(
+            self.n, self.total,
+            elapsed if elapsed is not None else self._time() - self.start_t,
+            self.dynamic_ncols(self.fp) if self.dynamic_ncols else self.ncols,
+            self.desc, self.ascii, self.unit,
+            self.unit_scale, self._rate(),
+            self.postfix, self.unit_divisor)
@@ -0,0 +1,113 @@
+"""
+Deadline scheduled monitor of progress bars.
+
+tqdm starts a monitor thread (TMonitor) in every process creating a bar, which wakes up
+periodically, locks all bars and looks for bars, which did not redraw for ``maxinterval``
+seconds. The monitor here keeps a heap of the deadlines of the bars it watches and sleeps
+exactly until the next bar is due.
+"""
+import itertools
+import os
+import threading
+import weakref
+from heapq import heappop, heappush
+
+__all__ = ['monitor']
+
+_monitor = None
+
+
+def monitor():
+    """ the monitor of this process. """
+    global _monitor
+    # threads do not survive a fork, so every process needs its own monitor.
+    if _monitor is None or _monitor.pid != os.getpid():
+        _monitor = _DeadlineMonitor()
+    return _monitor
+
+
+class _DeadlineMonitor(object):
+    """ Refreshes bars, which did not redraw for maxinterval seconds (just like TMonitor).
+
+    Only bars, which skip updates (miniters > 1), can miss their deadline, so other bars are not
+    watched at all. The thread is started with the first watched bar and exits, when no watched
+    bar is left. On every wake up only the due bar is looked at. If it has redrawn in the meantime,
+    it is rescheduled, otherwise its miniters are reset to 1 and it is refreshed. A ticker
+    gathering the increments of the bar is woken up, to hand them over on its next update.
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self._deadlines = []  # heap of (deadline, tie breaker, weak reference to bar)
+        self._watched = 0
+        self._order = itertools.count()
+        self._cond = threading.Condition(threading.Lock())
+        self._thread = None
+
+    def watch(self, bar):
+        """ refreshes the bar, if it did not redraw until bar.last_print_t + bar.maxinterval. """
+        with self._cond:
+            if bar._monitored:
+                return
+            bar._monitored = True
+            self._watched += 1
+            self._schedule(bar.last_print_t + bar.maxinterval, weakref.ref(bar))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='progress_reporter monitor')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def unwatch(self, bar):
+        with self._cond:
+            if not bar._monitored:
+                return
+            bar._monitored = False
+            self._watched -= 1
+            if not self._watched:
+                # only entries of closed bars are left.
+                del self._deadlines[:]
+                self._cond.notify()
+
+    def _schedule(self, deadline, ref):
+        earliest = not self._deadlines or deadline < self._deadlines[0][0]
+        heappush(self._deadlines, (deadline, next(self._order), ref))
+        if earliest:
+            self._cond.notify()
+
+    def _run(self):
+        cond = self._cond
+        with cond:
+            while self._deadlines:
+                deadline, _, ref = self._deadlines[0]
+                bar = ref()
+                if bar is None or not bar._monitored:
+                    heappop(self._deadlines)
+                    continue
+                now = bar._time()
+                if deadline > now:
+                    bar = None
+                    cond.wait(deadline - now)
+                    continue
+                heappop(self._deadlines)
+                due = bar.last_print_t + bar.maxinterval
+                if due > now and bar.miniters > 1:
+                    # redrawn in the meantime
+                    self._schedule(due, ref)
+                    continue
+                bar._monitored = False
+                self._watched -= 1
+                if bar.miniters > 1:
+                    cond.release()
+                    try:
+                        with bar.get_lock():
+                            if not bar.disable:
+                                # force bypassing miniters on next update, like TMonitor.
+                                bar.miniters = 1
+                                bar.refresh(nolock=True)
+                                ticker = getattr(bar, '_pg_ticker', None)
+                                if ticker is not None:
+                                    ticker._wake()
+                    finally:
+                        cond.acquire()
+                bar = None
+            self._thread = None
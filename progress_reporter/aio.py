@@ -0,0 +1,119 @@
+"""
+Progress reporting for asyncio applications.
+
+.. code:: python
+
+    from progress_reporter.aio import AsyncProgressReporter_
+
+    async def ingest(urls):
+        pg = AsyncProgressReporter_()
+        async with pg.context():
+            async for page in pg.aiterate(fetch_all(urls), amount_of_work=len(urls), stage='fetch'):
+                ...
+            results = [r async for r in pg.as_completed([parse(u) for u in urls], stage='parse')]
+
+Progress bars of this reporter are never drawn on update. Instead a callback scheduled on the
+event loop (see ``loop.call_later``) redraws all bars of the loop at a fixed rate, without
+acquiring the cross-process write lock of tqdm.
+"""
+import asyncio
+import weakref
+
+from .reporter import ProgressReporter_
+
+__all__ = ['AsyncProgressReporter_']
+
+# one renderer per event loop.
+_loop_renderers = weakref.WeakKeyDictionary()
+
+
+def _loop_renderer():
+    from .terminal import _LoopRenderer
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # not called from a coroutine, so we fall back to the renderer thread.
+        return True
+    renderer = _loop_renderers.get(loop)
+    if renderer is None:
+        renderer = _loop_renderers[loop] = _LoopRenderer(loop)
+    return renderer
+
+
+class _NullContext(object):
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _AsyncContext(object):
+    # (async) context manager finishing the stages on exit.
+    def __init__(self, ctx):
+        self._ctx = ctx
+
+    async def __aenter__(self):
+        return self._ctx.__enter__()
+
+    async def __aexit__(self, *exc):
+        return self._ctx.__exit__(*exc)
+
+    def __enter__(self):
+        return self._ctx.__enter__()
+
+    def __exit__(self, *exc):
+        return self._ctx.__exit__(*exc)
+
+
+class AsyncProgressReporter_(ProgressReporter_):
+    """ class to report progress from coroutines running on an asyncio event loop.
+
+    Stages have to be registered from within the event loop, whose callbacks draw the progress bars.
+    """
+
+    @property
+    def _pg_background_rendering(self):
+        return _loop_renderer()
+
+    def context(self, stage='all'):
+        """ context manager (usable with ``async with``) finishing the given stages on exit. """
+        return _AsyncContext(self._progress_context(stage=stage))
+
+    async def aiterate(self, aiterable, amount_of_work=None, description='', stage=0, tqdm_args=None):
+        """ Wraps an asynchronous iterable and counts every item as one piece of work of the stage.
+
+        Parameters
+        ----------
+        aiterable : async iterable
+        amount_of_work : int, optional
+            If given, the stage is registered with this amount of work and finished once the
+            iterable is exhausted. Otherwise the stage has to be registered already.
+        description : str, optional
+            Description of the stage, only used if amount_of_work is given.
+        stage : int, optional, default=0
+        tqdm_args : dict, optional
+            Passed to register, if amount_of_work is given.
+        """
+        if amount_of_work is not None:
+            self.register(amount_of_work, description=description, stage=stage, tqdm_args=tqdm_args)
+            ctx = self._progress_context(stage)
+        else:
+            ctx = _NullContext()
+        with ctx:
+            async for item in aiterable:
+                yield item
+                self.update(1, stage=stage)
+
+    async def as_completed(self, aws, description='', stage=0, tqdm_args=None):
+        """ Runs the given awaitables concurrently and yields their results in order of completion.
+
+        The stage is registered with the number of awaitables and finished, after the last one completed.
+        """
+        aws = list(aws)
+        self.register(len(aws), description=description, stage=stage, tqdm_args=tqdm_args)
+        with self._progress_context(stage):
+            for next_completed in asyncio.as_completed(aws):
+                result = await next_completed
+                self.update(1, stage=stage)
+                yield result
@@ -0,0 +1,145 @@
+"""
+A single progress bar for all stages of a reporter.
+
+If the ``_pg_combined`` attribute of a reporter is True, its stages do not get bars of their own,
+but all of them feed one bar. Every stage takes a share of this bar given by its weight (e.g. its
+expected relative cost), the description of the bar is the one of the stage updated last.
+
+.. code:: python
+
+    class Pipeline(ProgressReporter_):
+        _pg_combined = True
+
+    pg = Pipeline()
+    pg.register(len(files), description='loading', stage='load', weight=1)
+    pg.register(n_iter, description='fitting', stage='fit', weight=5)
+"""
+
+__all__ = ['CombinedBar', 'CombinedStage']
+
+# units of the combined bar per unit of weight, i.e. its resolution.
+_UNITS = 1000
+
+COMBINED_FORMAT = '{l_bar}{bar}| [{elapsed}<{remaining}{postfix}]'
+
+
+def units(weight):
+    """ the amount of work of the combined bar for a stage with the given weight. """
+    return max(1, int(round(weight * _UNITS)))
+
+
+class CombinedBar(object):
+    """ The bar shared by the stages of a reporter, it is closed with the last open stage.
+
+    Parameters
+    ----------
+    pg : tqdm
+        the shared bar, its total has to be the units of the first stage.
+    """
+
+    def __init__(self, pg):
+        self.pg = pg
+        self.current = None
+        self.closed = False
+        self._open = 0
+        self._reserved = pg.total
+
+    def stage(self, total, desc, weight):
+        """ adds a stage with the given amount of work and returns its view. """
+        stage_units = units(weight)
+        if self._reserved:
+            # the bar has been created with the units of the first stage.
+            stage_units, self._reserved = self._reserved, 0
+        else:
+            self.pg.total += stage_units
+        self._open += 1
+        return CombinedStage(self, total, desc, stage_units)
+
+    def _closed_stage(self):
+        self._open -= 1
+        if not self._open:
+            self.closed = True
+            self.pg.close()
+
+
+class CombinedStage(object):
+    """ View of a stage on the combined bar, used by the reporter just like a bar of its own.
+
+    Updates of the stage update the combined bar by whole units, so the combined bar decides
+    about redraws just like for a single stage.
+    """
+
+    def __init__(self, combined, total, desc, stage_units):
+        self._combined = combined
+        self.total = total
+        self.desc = desc
+        self.units = stage_units
+        self.n = 0
+        self.disable = False
+        self.avg_time = self.estimator = None
+        self.start_t = self._time()
+        self._pushed = 0
+
+    @property
+    def last_print_n(self):
+        return self._combined.pg.last_print_n
+
+    @property
+    def last_print_t(self):
+        return self._combined.pg.last_print_t
+
+    @property
+    def mininterval(self):
+        return self._combined.pg.mininterval
+
+    # stage views redraw nothing themselves, the combined bar skips updates.
+    miniters = 1
+
+    def _time(self):
+        return self._combined.pg._time()
+
+    def _rate(self):
+        return None
+
+    def get_lock(self):
+        return self._combined.pg.get_lock()
+
+    def _select(self):
+        # shows the description of this stage on the combined bar.
+        combined = self._combined
+        if combined.current is not self:
+            combined.current = self
+            combined.pg.desc = self.desc
+
+    def update(self, n=1):
+        if self.disable:
+            return
+        self.n += n
+        self._select()
+        self._push(self.units * min(self.n, self.total) // self.total)
+
+    def _push(self, target):
+        increment = target - self._pushed
+        if increment > 0:
+            self._pushed = target
+            self._combined.pg.update(increment)
+
+    def refresh(self, nolock=False):
+        if self.disable:
+            return
+        combined = self._combined
+        combined.current = self
+        combined.pg.desc = self.desc
+        combined.pg.refresh(nolock=nolock)
+
+    def set_description(self, desc=None, refresh=True):
+        self.desc = desc or ''
+        if self._combined.current is self:
+            self._combined.pg.set_description(desc, refresh=refresh)
+
+    def close(self):
+        if self.disable:
+            return
+        self.disable = True
+        self._push(self.units)
+        self._combined._closed_stage()
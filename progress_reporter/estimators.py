@@ -0,0 +1,271 @@
+"""
+Estimators of the rate of a stage, which determines its ETA.
+
+By default, progress bars smooth the time per item with an exponential moving average, like tqdm.
+Another estimator can be chosen per stage:
+
+.. code:: python
+
+    from progress_reporter.estimators import WindowedRegression
+
+    pg = ProgressReporter_()
+    pg.register(len(batches), description='fit', estimator=WindowedRegression(window=32))
+
+Estimators observe the amount of work done on every redraw of the bar. The cost of an observation
+only depends on the window of the estimator, not on the history, and no containers are allocated. To compare estimators on recorded runs, see :func:`score`.
+"""
+import json
+from array import array
+from bisect import bisect_left, insort
+
+__all__ = ['Estimator', 'EMA', 'WindowedRegression', 'MedianOfWindows', 'score', 'read_traces']
+
+
+class Estimator(object):
+    """ Interface of the estimators: observations go in by update, the rate comes out by rate. """
+    __slots__ = ()
+
+    def update(self, n, t):
+        """ observes that n items (in total) have been done at time t (in seconds). """
+        raise NotImplementedError
+
+    def rate(self):
+        """ the estimated items per second, None if unknown. """
+        raise NotImplementedError
+
+    def seed(self, rate):
+        """ starts with the given items per second (e.g. of earlier runs), until observations replace it. """
+        raise NotImplementedError
+
+
+class EMA(Estimator):
+    """ Exponential moving average of the time per item between observations (the rate of tqdm).
+
+    Parameters
+    ----------
+    smoothing : float, optional, default=0.3
+        weight of the latest observation, between 0 (average rate) and 1 (latest rate).
+    """
+    __slots__ = ('smoothing', '_n', '_t', '_avg_time')
+
+    def __init__(self, smoothing=0.3):
+        self.smoothing = smoothing
+        self._n = self._t = self._avg_time = None
+
+    def update(self, n, t):
+        if self._t is not None:
+            dn, dt = n - self._n, t - self._t
+            if dn <= 0 or dt <= 0:
+                # the time of a stall is accounted to the next progress.
+                return
+            if self._avg_time is None:
+                self._avg_time = dt / dn
+            else:
+                self._avg_time = self.smoothing * dt / dn + (1 - self.smoothing) * self._avg_time
+        self._n, self._t = n, t
+
+    def rate(self):
+        return 1 / self._avg_time if self._avg_time else None
+
+    def seed(self, rate):
+        self._avg_time = 1 / rate
+
+
+class WindowedRegression(Estimator):
+    """ Slope of a least squares line through the last window observations of n over time.
+
+    The observations are kept in a ring buffer together with running sums, from which the slope
+    is computed. The sums are relative to a reference observation, which is moved forward (and
+    the sums are recomputed) every time the ring buffer wraps around, to bound rounding errors.
+
+    Parameters
+    ----------
+    window : int, optional, default=32
+        number of observations to fit.
+    """
+    __slots__ = ('window', '_t', '_n', '_i', '_k', '_ref_t', '_ref_n', '_st', '_sn', '_stt', '_stn', '_seed')
+
+    def __init__(self, window=32):
+        if window < 2:
+            raise ValueError('window has to be at least 2, but is {}'.format(window))
+        self.window = window
+        self._t = array('d', bytes(8 * window))
+        self._n = array('d', bytes(8 * window))
+        self._i = self._k = 0
+        self._ref_t = self._ref_n = None
+        self._st = self._sn = self._stt = self._stn = 0.
+        self._seed = None
+
+    def update(self, n, t):
+        k, i = self._k, self._i
+        if k and t <= self._t[i - 1]:
+            return
+        if self._ref_t is None:
+            self._ref_t, self._ref_n = t, n
+        if k == self.window:
+            # drop the oldest observation
+            x, y = self._t[i] - self._ref_t, self._n[i] - self._ref_n
+            self._st -= x
+            self._sn -= y
+            self._stt -= x * x
+            self._stn -= x * y
+        else:
+            self._k = k = k + 1
+        self._t[i] = t
+        self._n[i] = n
+        x, y = t - self._ref_t, n - self._ref_n
+        self._st += x
+        self._sn += y
+        self._stt += x * x
+        self._stn += x * y
+        self._i = i = (i + 1) % self.window
+        if i == 0:
+            self._rebase()
+
+    def _rebase(self):
+        # relative to the oldest observation, which is at the current index after a wrap around.
+        ts, ns = self._t, self._n
+        ref_t, ref_n = self._ref_t, self._ref_n = ts[self._i], ns[self._i]
+        st = sn = stt = stn = 0.
+        for j in range(self._k):
+            x, y = ts[j] - ref_t, ns[j] - ref_n
+            st += x
+            sn += y
+            stt += x * x
+            stn += x * y
+        self._st, self._sn, self._stt, self._stn = st, sn, stt, stn
+
+    def rate(self):
+        k = self._k
+        if k < 2:
+            return self._seed
+        denominator = k * self._stt - self._st * self._st
+        if denominator <= 0:
+            return self._seed
+        slope = (k * self._stn - self._st * self._sn) / denominator
+        return slope if slope > 0 else None
+
+    def seed(self, rate):
+        self._seed = rate
+
+
+class MedianOfWindows(Estimator):
+    """ Median of the rates of the last window intervals between observations.
+
+    Single bursts or stalls do not move the median, contrary to averages. The rates are kept in
+    a ring buffer and a sorted list of the same length, so an observation costs O(window).
+
+    Parameters
+    ----------
+    window : int, optional, default=9
+        number of intervals to take the median of.
+    """
+    __slots__ = ('window', '_rates', '_sorted', '_i', '_n', '_t', '_seed')
+
+    def __init__(self, window=9):
+        if window < 1:
+            raise ValueError('window has to be at least 1, but is {}'.format(window))
+        self.window = window
+        self._rates = array('d', bytes(8 * window))
+        self._sorted = []
+        self._i = 0
+        self._n = self._t = self._seed = None
+
+    def update(self, n, t):
+        if self._t is not None:
+            dt = t - self._t
+            if dt <= 0:
+                return
+            rate = (n - self._n) / dt
+            srt = self._sorted
+            if len(srt) == self.window:
+                del srt[bisect_left(srt, self._rates[self._i])]
+            self._rates[self._i] = rate
+            insort(srt, rate)
+            self._i = (self._i + 1) % self.window
+        self._n, self._t = n, t
+
+    def rate(self):
+        srt = self._sorted
+        k = len(srt)
+        if not k:
+            return self._seed
+        median = srt[k // 2] if k % 2 else (srt[k // 2 - 1] + srt[k // 2]) / 2
+        return median if median > 0 else None
+
+    def seed(self, rate):
+        self._seed = rate
+
+
+def score(make_estimator, traces):
+    """ Scores the accuracy of the ETAs of an estimator on recorded traces of stages.
+
+    For every observation of a trace (but the last one), the remaining time estimated after
+    the observation is compared to the actual remaining time, which is known from the last
+    observation of the trace (the stage is assumed to be done then).
+
+    Parameters
+    ----------
+    make_estimator : callable
+        returns a new estimator, e.g. the class of the estimator.
+    traces : iterable of sequences of (t, n) pairs
+        observations of complete runs of stages, e.g. read by :func:`read_traces`.
+
+    Returns
+    -------
+    score : dict
+        'mean' and 'median' of the relative errors of the estimated remaining time
+        (abs(estimated - actual) / actual) and 'coverage', the fraction of observations
+        after which an ETA was available.
+    """
+    errors = []
+    observations = 0
+    for trace in traces:
+        if len(trace) < 2:
+            continue
+        end_t, total = trace[-1]
+        estimator = make_estimator()
+        for t, n in trace[:-1]:
+            estimator.update(n, t)
+            observations += 1
+            rate = estimator.rate()
+            if rate:
+                actual = end_t - t
+                errors.append(abs((total - n) / rate - actual) / actual if actual else 0.)
+    errors.sort()
+    k = len(errors)
+    return {'mean': sum(errors) / k if k else None,
+            'median': errors[k // 2] if k else None,
+            'coverage': k / observations if observations else 0.}
+
+
+def read_traces(lines):
+    """ Reads traces of stages from the events written by progress_reporter.jsonl.
+
+    Parameters
+    ----------
+    lines : iterable of str
+        e.g. an opened file of JSON lines events.
+
+    Returns
+    -------
+    traces : list of lists of (elapsed, n) pairs
+        one trace for every stage, which has been finished with all of its work done.
+        Stages are told apart by their stage key only.
+    """
+    traces = []
+    running = {}
+    for line in lines:
+        event = json.loads(line)
+        key = json.dumps(event['stage'])
+        observation = (event['elapsed'], event['n'])
+        if event['event'] == 'register':
+            running[key] = [observation]
+        elif event['event'] == 'sample':
+            running.setdefault(key, []).append(observation)
+        elif event['event'] == 'finish':
+            trace = running.pop(key, None)
+            if trace is not None and event['n'] == event['total']:
+                trace.append(observation)
+                traces.append(trace)
+    return traces
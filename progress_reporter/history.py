@@ -0,0 +1,102 @@
+"""
+History of the throughput of stages, which seeds the ETA of new runs.
+
+.. code:: python
+
+    import progress_reporter
+    progress_reporter.set_history('~/.cache/progress_reporter/history.jsonl')
+
+Once a history is set (or the environment variable **PROGRESS_REPORTER_HISTORY** names its path),
+the rate of every stage, which has been finished with all of its work done, is recorded for the
+class of its reporter, its stage key and its description. A new run of the same stage starts with
+the recorded rate, so its ETA is meaningful from the first redraw.
+
+The history is an append-only file of JSON lines, so several processes can record into the same
+file. It is read once on first use, all further lookups are served from memory.
+"""
+import json
+import os
+import tempfile
+import threading
+
+__all__ = ['History']
+
+
+class History(object):
+    """ Rates of stages recorded in an append-only file.
+
+    Parameters
+    ----------
+    path : str
+        the file to read the rates from and to record new rates to.
+    smoothing : float, optional, default=0.5
+        weight of a newly recorded rate, compared to the rate of earlier runs.
+    """
+
+    def __init__(self, path, smoothing=0.5):
+        self.path = os.path.expanduser(path)
+        self.smoothing = smoothing
+        self._rates = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(reporter, stage, description):
+        """ the key, rates of the given stage are recorded for. """
+        cls = type(reporter)
+        return '{}.{}'.format(cls.__module__, cls.__name__), str(stage), description or ''
+
+    def rate(self, key):
+        """ the recorded items per second of the stage with the given key, None if unknown. """
+        rates = self._rates
+        if rates is None:
+            rates = self._load()
+        return rates.get(key)
+
+    def record(self, key, rate):
+        """ records the items per second of a finished run of the stage with the given key. """
+        line = json.dumps({'key': key, 'rate': rate}) + '\n'
+        with self._lock:
+            if self._rates is None:
+                self._load()
+            self._add(key, rate)
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(self.path, 'a') as f:
+                f.write(line)
+
+    def _add(self, key, rate):
+        old = self._rates.get(key)
+        self._rates[key] = rate if old is None else self.smoothing * rate + (1 - self.smoothing) * old
+
+    def _load(self):
+        self._rates = {}
+        lines = 0
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        key, rate = tuple(entry['key']), float(entry['rate'])
+                    except (ValueError, KeyError, TypeError):
+                        # e.g. a line, which is still being written by another process.
+                        continue
+                    self._add(key, rate)
+                    lines += 1
+        except (IOError, OSError):
+            return self._rates
+        if lines > 2 * len(self._rates) + 100:
+            self._compact()
+        return self._rates
+
+    def _compact(self):
+        # replaces the file by one line per key. Rates recorded by other processes meanwhile are lost.
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(self.path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                for key, rate in self._rates.items():
+                    f.write(json.dumps({'key': key, 'rate': rate}) + '\n')
+            os.replace(tmp, self.path)
+        except (IOError, OSError):
+            os.unlink(tmp)
@@ -0,0 +1,162 @@
+"""
+Progress written as JSON lines events, e.g. for log collectors.
+
+Instead of drawing a bar with carriage returns, every stage writes one event per line to a
+file-like object:
+
+.. code:: text
+
+    {"event":"register","stage":0,"desc":"fit","n":0,"total":1000,"rate":null,"elapsed":0.000}
+    {"event":"sample","stage":0,"desc":"fit","n":420,"total":1000,"rate":417.9,"elapsed":1.005}
+    {"event":"finish","stage":0,"desc":"fit","n":1000,"total":1000,"rate":421.3,"elapsed":2.374}
+
+Samples are written at most every ``interval`` seconds per stage (and only if the progress
+changed). The output is selected globally by ``progress_reporter.set_output(JSONLinesOutput(file))``
+or the environment variable **PROGRESS_REPORTER_OUTPUT=jsonl** (JSON lines to stdout), or per
+reporter by assigning its ``_progress_output``.
+"""
+import json
+import sys
+import threading
+
+from . import _monitor
+from ._format import CompiledMeterMixin
+from ._vendor.tqdm import tqdm
+
+__all__ = ['JSONLinesOutput']
+
+# pre-encoded keys of the fields following the event, stage and description.
+_N = ',"n":'
+_TOTAL = ',"total":'
+_RATE = ',"rate":'
+_ELAPSED = ',"elapsed":'
+_END = '}\n'
+
+_EVENTS = ('register', 'sample', 'finish')
+
+
+def _number(x):
+    if x is None:
+        return 'null'
+    return str(x) if x.__class__ is int else repr(float(x))
+
+
+class JSONLinesOutput(object):
+    """ Output backend writing the progress of stages as JSON lines events.
+
+    Parameters
+    ----------
+    file : file-like object, optional
+        the events are written to. Defaults to sys.stdout (looked up on every write).
+    interval : float, optional, default=1.0
+        minimum number of seconds between two samples of a stage.
+    """
+
+    def __init__(self, file=None, interval=1.0):
+        self.file = file
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    def progressbar(self, stage, total, desc='', **tqdm_args):
+        """ creates the bar of a stage, which writes events instead of drawing itself. """
+        # arguments only relevant to drawing
+        for key in ('file', 'dynamic_ncols', 'ncols', 'leave', 'position', 'background'):
+            tqdm_args.pop(key, None)
+        tqdm_args.setdefault('mininterval', self.interval)
+        return _JSONLinesBar(self, stage, total=total, desc=desc, **tqdm_args)
+
+    def write(self, line):
+        fp = self.file if self.file is not None else sys.stdout
+        with self._lock:
+            fp.write(line)
+            fp.flush()
+
+
+class _JSONLinesBar(CompiledMeterMixin, tqdm):
+    """ tqdm, which writes events to a JSONLinesOutput instead of drawing a bar. """
+    # stalled stages are sampled by the deadline monitor (see _monitor).
+    monitor_interval = 0
+
+    def __init__(self, output, stage, *args, **kwargs):
+        self._output = output
+        self._monitored = False
+        self._stage = json.dumps(stage, default=str)
+        self._heads_desc = self._heads = None
+        self._last_n = None
+        # gui=True avoids the initial print, the bar is not complete yet (just like tqdm_notebook).
+        kwargs['gui'] = True
+        super(_JSONLinesBar, self).__init__(*args, **kwargs)
+        if self.disable:
+            return
+        self.sp = self._sample
+        self._emit(0)
+
+    @classmethod
+    def _get_free_pos(cls, instance=None):
+        # events do not occupy rows.
+        return 0
+
+    @classmethod
+    def _decr_instances(cls, instance):
+        with cls._lock:
+            cls._instances.discard(instance)
+
+    def moveto(self, n):
+        pass
+
+    def clear(self, nolock=False):
+        pass
+
+    def __repr__(self, elapsed=None):
+        # the redraws of tqdm only take a sample (see _sample), so the text meter is never built.
+        if self.estimator is not None:
+            self.estimator.update(self.n, self._time())
+        return ''
+
+    def _emit(self, event):
+        desc = self.desc
+        if desc is None and self._heads is not None:
+            # stages finished without a description keep their last one.
+            desc = self._heads_desc
+        if desc is not self._heads_desc or self._heads is None:
+            # the head of a line only changes with the description.
+            self._heads_desc = desc
+            head = ',"stage":' + self._stage + ',"desc":' + json.dumps(desc or '')
+            self._heads = tuple('{"event":"' + e + '"' + head for e in _EVENTS)
+        elapsed = self._time() - self.start_t
+        rate = self._rate()
+        if rate is None:
+            rate = self.n / elapsed if elapsed and self.n else None
+        self._last_n = self.n
+        self._output.write(''.join((
+            self._heads[event], _N, _number(self.n), _TOTAL, _number(self.total),
+            _RATE, 'null' if rate is None else '%.6g' % rate, _ELAPSED, '%.3f' % elapsed, _END)))
+
+    def _sample(self, _=''):
+        # called instead of printing the meter on redraws.
+        if self.n != self._last_n:
+            self._emit(1)
+
+    def update(self, n=1):
+        redraw = not self.disable and self.n + n - self.last_print_n >= self.miniters
+        super(_JSONLinesBar, self).update(n)
+        if redraw:
+            self._watch()
+
+    def _watch(self):
+        if self.miniters > 1 and self.maxinterval and not self._monitored:
+            _monitor.monitor().watch(self)
+
+    def close(self):
+        if self.disable:
+            return
+        self.disable = True
+        self._decr_instances(self)
+        if self._monitored:
+            _monitor.monitor().unwatch(self)
+        if self.last_print_n < self.n:
+            # overall rate like tqdm
+            self.avg_time = None
+            if self.estimator is not None:
+                self.estimator.update(self.n, self._time())
+        self._emit(2)
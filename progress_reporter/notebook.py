@@ -1,11 +1,169 @@
+import threading
+import weakref
+from collections import OrderedDict
+from time import time
+
+try:  # Py3
+    from html import escape
+except ImportError:  # Py2
+    from cgi import escape
+
+from ._format import CompiledMeterMixin
 from ._vendor.tqdm._tqdm_notebook import tqdm_notebook
 
+# the statistics shown next to the widget, the description is shown in a label before it.
+_STATUS_FORMAT = '{percentage:3.0f}% {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}{postfix}]'
+
+
+class _CommThrottle(object):
+    """ Limits the rate of widget updates sent by all bars of the kernel.
+
+    Printers with changes request to be flushed. They are flushed in order of their requests,
+    as long as the budget of messages allows it (a token bucket refilled with max_rate messages
+    per second), otherwise their changes stay pending. Pending changes are flushed by a later
+    request or by a timer, which fires once the bucket holds a token again, so the last changes
+    of stalled bars are shown as well.
+
+    Parameters
+    ----------
+    max_rate : float
+        messages per second sent to the frontend.
+    burst : int
+        messages which can be sent at once, after no message has been sent for a while.
+    """
+
+    def __init__(self, max_rate=30, burst=10, time=time, timer=threading.Timer):
+        self.max_rate = max_rate
+        self.burst = burst
+        self._time = time
+        self._timer = timer
+        self._scheduled = None
+        self._tokens = burst
+        self._last = time()
+        self._pending = OrderedDict()
+        self._lock = threading.RLock()
+
+    def request(self, printer):
+        with self._lock:
+            self._pending.setdefault(printer)
+            self._flush()
+
+    def _flush(self):
+        now = self._time()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.max_rate)
+        self._last = now
+        while self._pending and self._tokens >= 1:
+            printer, _ = self._pending.popitem(last=False)
+            self._tokens -= printer.flush()
+        if self._pending and self._scheduled is None:
+            self._scheduled = self._timer((1 - self._tokens) / self.max_rate, self._deferred)
+            self._scheduled.daemon = True
+            self._scheduled.start()
+
+    def _deferred(self):
+        with self._lock:
+            self._scheduled = None
+            self._flush()
+
+    def final(self, printer, bar_style=None):
+        """ flushes the printer regardless of the budget, e.g. to show the final state of a bar. """
+        with self._lock:
+            self._pending.pop(printer, None)
+            self._tokens -= printer.flush(bar_style)
+
+
+_throttle = _CommThrottle()
+
+
+class _WidgetPrinter(object):
+    """ Shows the state of a bar in its widgets.
+
+    The value of the progress widget is taken from the bar, instead of parsing it back from the
+    formatted meter. Every assignment to a trait of a widget is sent to the frontend, so the value
+    and the (HTML escaped) status text are only assigned, if they changed. Changes are sent, when
+    the throttle of the kernel allows it (see _CommThrottle). All changed traits of a widget are
+    sent in a single message, the final state of a bar is always sent.
+    Instances are called by tqdm_notebook just like its print_status function.
+    """
+
+    def __init__(self, bar, total, pbar, ptext, container, description=None, throttle=None):
+        # the bar owns its printer, so we must not keep it alive.
+        self._bar = weakref.ref(bar)
+        self._total = total
+        self.pbar = pbar
+        self.ptext = ptext
+        self.container = container
+        self.description = description
+        self._throttle = throttle if throttle is not None else _throttle
+        self._n = self._text = None
+        self._pending_n = self._pending_text = None
+
+    def show(self, n, text):
+        """ sets the value of the progress widget to n and the status text to text. """
+        # the changes may be flushed by the timer of the throttle at any time.
+        with self._throttle._lock:
+            if self._total and n is not None and n <= self._total:
+                self._pending_n = n if n != self._n else None
+            self._pending_text = text if text != self._text else None
+            if self._pending_n is not None or self._pending_text is not None:
+                self._throttle.request(self)
+
+    def flush(self, bar_style=None):
+        """ sends the pending changes and returns the number of messages sent. """
+        messages = 0
+        n, self._pending_n = self._pending_n, None
+        # Hack-ish way to avoid the danger bar_style being overriden by
+        # success because the bar gets closed after the error...
+        if bar_style and self.pbar.bar_style == 'danger' and bar_style == 'success':
+            bar_style = None
+        if n is not None or bar_style:
+            with self.pbar.hold_sync():
+                if n is not None:
+                    self._n = self.pbar.value = n
+                if bar_style:
+                    self.pbar.bar_style = bar_style
+            messages += 1
+        text, self._pending_text = self._pending_text, None
+        if text is not None:
+            self._text = text
+            self.ptext.value = escape(text)
+            messages += 1
+        return messages
+
+    def __call__(self, s='', close=False, bar_style=None, desc=None):
+        # Note: contrary to native tqdm, s='' does NOT clear bar
+        # goal is to keep all infos if error happens so user knows
+        # at which iteration the loop failed.
+        if s:
+            bar = self._bar()
+            self.show(bar.n if bar is not None else None, s)
+
+        # tqdm_notebook passes a bar_style or close, when the bar is closed.
+        if bar_style or close:
+            self._throttle.final(self, bar_style)
+
+        # Special signal to close the bar
+        if close and self.pbar.bar_style != 'danger':  # hide only if no error
+            try:
+                self.container.close()
+            except AttributeError:
+                self.container.visible = False
+
+        # Update description
+        if desc and self.description is not None:
+            self.description.value = desc
+
 
 # we just override the default formatting of the widget here
-class my_tqdm_notebook(tqdm_notebook):
+class my_tqdm_notebook(CompiledMeterMixin, tqdm_notebook):
+
+    def __init__(self, *args, **kwargs):
+        # the value of the progress widget is not part of the text (see _WidgetPrinter).
+        if not kwargs.get('bar_format'):
+            kwargs['bar_format'] = _STATUS_FORMAT
+        super(my_tqdm_notebook, self).__init__(*args, **kwargs)
 
-    @staticmethod
-    def status_printer(_, total=None, desc=None, ncols=None):
+    def status_printer(self, _, total=None, desc=None, ncols=None):
         # Prepare IPython progress bar
         from ipywidgets import IntProgress, HTML, HBox, Layout, Label
 
@@ -21,7 +179,7 @@ class my_tqdm_notebook(tqdm_notebook):
             description_box.layout.min_width = '35%'
             description_box.layout.max_width = '35%'
         else:
-            description_box = None
+            description = description_box = None
 
         # Prepare status text
         ptext = HTML()
@@ -47,56 +205,4 @@ class my_tqdm_notebook(tqdm_notebook):
         from IPython.core.display import display
         display(container)
 
-        # HTML encoding
-        try:  # Py3
-            from html import escape
-        except ImportError:  # Py2
-            from cgi import escape
-
-        def print_status(s='', close=False, bar_style=None, desc=None):
-            # Note: contrary to native tqdm, s='' does NOT clear bar
-            # goal is to keep all infos if error happens so user knows
-            # at which iteration the loop failed.
-
-            # Clear previous output (really necessary?)
-            # clear_output(wait=1)
-
-            # Get current iteration value from format_meter string
-            if total:
-                # n = None
-                if s:
-                    npos = s.find(r'/|/')  # cause we use bar_format=r'{n}|...'
-                    # Check that n can be found in s (else n > total)
-                    if npos >= 0:
-                        n = int(s[:npos])  # get n from string
-                        s = s[npos + 3:]  # remove from string
-
-                        # Update bar with current n value
-                        if n is not None:
-                            pbar.value = n
-
-            # Print stats
-            if s:  # never clear the bar (signal: s='')
-                s = s.replace('||', '')  # remove inesthetical pipes
-                s = escape(s)  # html escape special characters (like '?')
-                ptext.value = s
-
-            # Change bar style
-            if bar_style:
-                # Hack-ish way to avoid the danger bar_style being overriden by
-                # success because the bar gets closed after the error...
-                if not (pbar.bar_style == 'danger' and bar_style == 'success'):
-                    pbar.bar_style = bar_style
-
-            # Special signal to close the bar
-            if close and pbar.bar_style != 'danger':  # hide only if no error
-                try:
-                    container.close()
-                except AttributeError:
-                    container.visible = False
-
-            # Update description
-            if desc:
-                description.value = desc
-
-        return print_status
+        return _WidgetPrinter(self, total, pbar, ptext, container, description)
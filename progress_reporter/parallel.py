@@ -0,0 +1,383 @@
+"""
+Reporting progress of a registered stage from other processes.
+
+The parent process owns the progress bar. Worker processes obtain a picklable
+:class:`StageProxy` (see :meth:`ProgressReporter._progress_worker_proxy`), which
+accumulates increments locally and sends them in batches to the parent.
+
+.. code:: python
+
+    def work(args):
+        chunk, proxy = args
+        for x in chunk:
+            ...
+            proxy.update(1)
+        proxy.flush()
+
+    pg = ProgressReporter_()
+    pg.register(len(data), description='parallel work')
+    proxy = pg.worker_proxy()
+    with pg.context(), multiprocessing.Pool() as pool:
+        pool.map(work, [(chunk, proxy) for chunk in chunks])
+
+Stages registered with ``thread_safe=True`` are backed by a :class:`ThreadShardedCounter`,
+which threads of the owning process increment in shards of their own, merged by the same sampler.
+
+Alternatively, the progress of a stage can be backed by a :class:`SharedCounter`
+(see :meth:`ProgressReporter._progress_shared_counter`), a counter in a memory mapped
+file, which threads and processes increment without any locking. A single thread of the
+owning process samples the counter at the display rate and updates the progress bar.
+"""
+import os
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+__all__ = ['StageProxy', 'SharedCounter', 'ThreadShardedCounter']
+
+# connections to parent processes of this process, keyed by (pid, address).
+_connections = {}
+_connections_lock = threading.Lock()
+
+# the pid of this process, updated in forked children, so updates do not need a system call.
+_pid = os.getpid()
+
+
+def _forked():
+    global _pid
+    _pid = os.getpid()
+
+
+if hasattr(os, 'register_at_fork'):
+    # not available on Windows, which does not fork either.
+    os.register_at_fork(after_in_child=_forked)
+
+
+def _connection(address, authkey):
+    key = (os.getpid(), address)
+    with _connections_lock:
+        conn = _connections.get(key)
+        if conn is None:
+            conn = _connections[key] = (Client(address, authkey=authkey), threading.Lock())
+    return conn
+
+
+class StageProxy(object):
+    """ Picklable handle to report progress of a stage registered in another process.
+
+    Increments are accumulated locally and sent to the owning process, once
+    batch_size increments have been gathered or flush() is called. Pending
+    increments are also sent, when the proxy is garbage collected.
+    """
+
+    def __init__(self, address, authkey, stage, batch_size=100):
+        self.address = address
+        self.stage = stage
+        self.batch_size = batch_size
+        self._authkey = authkey
+        self._pending = 0
+
+    def __reduce__(self):
+        # pending increments stay in the pickling process.
+        return StageProxy, (self.address, self._authkey, self.stage, self.batch_size)
+
+    def update(self, increment=1):
+        """ Increments the progress of the stage by the given amount. """
+        self._pending += increment
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """ Sends the accumulated increments to the owning process. """
+        pending, self._pending = self._pending, 0
+        if not pending or self.address is None:
+            return
+        try:
+            conn, lock = _connection(self.address, self._authkey)
+            with lock:
+                conn.send((self.stage, pending))
+        except (OSError, EOFError):
+            # the owner has already finished the stage.
+            self.address = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+        return False
+
+    def __del__(self):
+        try:
+            self.flush()
+        except Exception:
+            pass
+
+
+class _ProgressListener(object):
+    """ Receives increments sent by StageProxy instances and applies them to the reporter. """
+
+    def __init__(self, reporter):
+        self._authkey = os.urandom(32)
+        self._listener = Listener(authkey=self._authkey)
+        self.address = self._listener.address
+        self._reporter = reporter
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._accept, name='progress_reporter listener')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def proxy(self, stage, batch_size=100):
+        return StageProxy(self.address, self._authkey, stage, batch_size=batch_size)
+
+    def _accept(self):
+        while True:
+            try:
+                conn = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                if self._closed:
+                    return
+                continue
+            if self._closed:
+                conn.close()
+                return
+            receiver = threading.Thread(target=self._receive, args=(conn, ))
+            receiver.daemon = True
+            receiver.start()
+
+    def _receive(self, conn):
+        # runs until the sending process closes the connection (e.g. on exit).
+        with conn:
+            while True:
+                try:
+                    stage, increment = conn.recv()
+                except (OSError, EOFError):
+                    return
+                with self._lock:
+                    if self._closed:
+                        continue
+                    try:
+                        self._reporter._progress_update(increment, stage=stage)
+                    except RuntimeError:
+                        # stage has already been finished.
+                        pass
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        # accept() is not interrupted by closing the listener, so we wake it up by connecting.
+        try:
+            Client(self.address, authkey=self._authkey).close()
+        except (OSError, EOFError):
+            pass
+        self._thread.join()
+        self._listener.close()
+
+
+class _SlotClaim(object):
+    # exclusive right of one thread of a process to write to a slot, released once the thread has finished.
+    __slots__ = ('view', 'index', 'marker', 'pid')
+
+    def __init__(self, view, index, marker):
+        self.view = view
+        self.index = index
+        self.marker = marker
+        self.pid = _pid
+
+    def __del__(self):
+        if self.pid != _pid:
+            # inherited by a fork, the slot still belongs to the parent.
+            return
+        try:
+            os.unlink(self.marker)
+        except OSError:
+            pass
+
+
+class SharedCounter(object):
+    """ Progress counter living in a memory mapped file.
+
+    The counter can be incremented by many threads and processes without any locking:
+    every writing thread claims a slot of its own once (by exclusively creating a marker file)
+    and afterwards only adds to this slot. Claims are not inherited by forked processes. The value of the counter is the sum of all slots.
+    Instances can be pickled to be send to worker processes.
+    """
+
+    def __init__(self, path, slots=256):
+        self.path = path
+        self.slots = slots
+        self._local = threading.local()
+        self._mmap = None
+
+    def __reduce__(self):
+        return SharedCounter, (self.path, self.slots)
+
+    @classmethod
+    def create(cls, slots=256):
+        import tempfile
+        fd, path = tempfile.mkstemp(prefix='progress_reporter_', suffix='.counter')
+        try:
+            os.write(fd, b'\0' * (8 * slots))
+        finally:
+            os.close(fd)
+        return cls(path, slots)
+
+    def _view(self):
+        if self._mmap is None:
+            import mmap
+            with open(self.path, 'r+b') as fh:
+                self._mmap = mmap.mmap(fh.fileno(), 8 * self.slots)
+            self._values = memoryview(self._mmap).cast('q')
+        return self._values
+
+    def _claim(self):
+        view = self._view()
+        for i in range(self.slots):
+            marker = '{}.{}'.format(self.path, i)
+            try:
+                os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            except OSError:
+                continue
+            self._local.claim = claim = _SlotClaim(view, i, marker)
+            return claim
+        raise RuntimeError('all {} slots of the shared counter are in use.'.format(self.slots))
+
+    def update(self, increment=1):
+        """ Increments the counter by the given amount. """
+        try:
+            claim = self._local.claim
+            if claim.pid != _pid:
+                # the claim of the thread, which forked this process.
+                claim = self._claim()
+        except AttributeError:
+            claim = self._claim()
+        claim.view[claim.index] += increment
+
+    @property
+    def value(self):
+        return sum(self._view())
+
+    def unlink(self):
+        """ Removes the backing file and all markers of claimed slots. """
+        for i in range(self.slots):
+            try:
+                os.unlink('{}.{}'.format(self.path, i))
+            except OSError:
+                pass
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class _Shard(object):
+    __slots__ = ('n', )
+
+    def __init__(self):
+        self.n = 0
+
+
+class ThreadShardedCounter(object):
+    """ Progress counter of a single process, which many threads increment without locking.
+
+    Every thread gets a shard of its own (in thread-local storage) on its first update and
+    afterwards only adds to this shard. The value of the counter is the sum of all shards,
+    shards of finished threads are kept, so the value is exact.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = self._local.shard = _Shard()
+        with self._lock:
+            self._shards.append(shard)
+        return shard
+
+    def update(self, increment=1):
+        """ Increments the counter by the given amount. """
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shard()
+        shard.n += increment
+
+    @property
+    def value(self):
+        with self._lock:
+            shards = tuple(self._shards)
+        return sum(shard.n for shard in shards)
+
+    def unlink(self):
+        pass
+
+
+class _NullCounter(object):
+    # stands in for a shared counter of stages without a progress bar.
+    value = 0
+
+    def update(self, increment=1):
+        pass
+
+    def unlink(self):
+        pass
+
+
+class _SharedCounterSampler(object):
+    """ Thread which periodically samples shared counters and applies their progress to the reporter. """
+
+    def __init__(self, reporter, interval=0.1):
+        self._reporter = reporter
+        self._interval = interval
+        self._counters = {}
+        self._seen = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='progress_reporter sampler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def add(self, stage, counter):
+        with self._lock:
+            self._counters[stage] = counter
+            self._seen[stage] = 0
+
+    def counter(self, stage):
+        return self._counters.get(stage)
+
+    def _sample(self, stage):
+        value = self._counters[stage].value
+        increment = value - self._seen[stage]
+        if increment > 0:
+            self._seen[stage] = value
+            self._reporter._progress_merge(increment, stage=stage)
+
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            with self._lock:
+                for stage in tuple(self._counters):
+                    self._sample(stage)
+
+    def remove(self, stage):
+        """ takes a final sample of the stage and removes its counter. """
+        with self._lock:
+            if stage not in self._counters:
+                return
+            self._sample(stage)
+            self._counters.pop(stage).unlink()
+            del self._seen[stage]
+
+    @property
+    def empty(self):
+        return not self._counters
+
+    def close(self):
+        self._stopped.set()
+        self._thread.join()
+        with self._lock:
+            for counter in self._counters.values():
+                counter.unlink()
+            self._counters.clear()
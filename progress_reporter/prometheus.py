@@ -0,0 +1,179 @@
+"""
+Progress of all active stages in the Prometheus exposition format.
+
+.. code:: python
+
+    from progress_reporter.prometheus import TextfileExporter, HTTPExporter
+
+    # for the textfile collector of the node exporter
+    exporter = TextfileExporter('/var/lib/node_exporter/textfile/fit.prom', interval=15)
+    # or scraped directly from http://127.0.0.1:9464/metrics
+    exporter = HTTPExporter(port=9464)
+    ...
+    exporter.close()
+
+For every stage, which has been registered and not finished yet, the gauges
+
+.. code:: text
+
+    progress_reporter_n{id="0",reporter="Estimator",stage="0",desc="fit"} 420
+    progress_reporter_total{...} 1000
+    progress_reporter_rate{...} 417.9
+    progress_reporter_eta_seconds{...} 1.388
+    progress_reporter_elapsed_seconds{...} 1.005
+
+are exported. The values are read from the progress bars when the metrics are collected,
+so updating the progress does not cost anything extra.
+"""
+import os
+import tempfile
+import threading
+
+from . import reporter
+
+__all__ = ['exposition', 'write_textfile', 'TextfileExporter', 'HTTPExporter']
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# (name, help), the samples are in the same order.
+_METRICS = (
+    ('progress_reporter_n', 'Amount of work done in the stage.'),
+    ('progress_reporter_total', 'Amount of work registered for the stage.'),
+    ('progress_reporter_rate', 'Work done per second (as estimated for the progress bar).'),
+    ('progress_reporter_eta_seconds', 'Estimated seconds until the stage is done.'),
+    ('progress_reporter_elapsed_seconds', 'Seconds since the stage has been registered.'),
+)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _samples(pg, now):
+    # n, total, rate, eta and elapsed of the bar, None for unknown values.
+    n, total = pg.n, pg.total
+    elapsed = now - pg.start_t
+    rate = pg._rate()
+    if rate is None:
+        rate = n / elapsed if elapsed and n else None
+    eta = (total - n) / rate if rate and total else None
+    return n, total, rate, eta, elapsed
+
+
+def exposition():
+    """ returns the metrics of all active stages in the Prometheus text format. """
+    rows = []
+    for pg in reporter._active_progressbars():
+        if pg.disable:
+            continue
+        labels = '{{id="{0}",reporter="{1}",stage="{2}",desc="{3}"}} '.format(
+            pg._pg_id, _label(pg._pg_reporter), _label(pg._pg_stage), _label(pg.desc or ''))
+        rows.append((pg._pg_id, labels, _samples(pg, pg._time())))
+    rows.sort()
+    out = []
+    for i, (name, help) in enumerate(_METRICS):
+        out.append('# HELP {0} {1}\n# TYPE {0} gauge\n'.format(name, help))
+        for _, labels, samples in rows:
+            value = samples[i]
+            if value is not None:
+                out.append(name + labels + repr(float(value)) + '\n')
+    return ''.join(out)
+
+
+def write_textfile(path):
+    """ writes the metrics of all active stages atomically to the given path.
+
+    The metrics are written to a temporary file in the same directory, which is then renamed,
+    so a collector never reads a partially written file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(exposition())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class _Exporter(object):
+    # runs target in a daemon thread until closed.
+    def __init__(self, target, name):
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=target, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def close(self):
+        """ stops exporting the metrics. """
+        self._closed.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class TextfileExporter(_Exporter):
+    """ Writes the metrics of all active stages to a file every interval seconds (see write_textfile).
+
+    Parameters
+    ----------
+    path : str
+        the file to write, e.g. in the directory of the textfile collector of the node exporter.
+    interval : float, optional, default=15
+        seconds between two writes. The file is also written once more on close.
+    """
+
+    def __init__(self, path, interval=15.):
+        self.path = path
+        self.interval = interval
+        super(TextfileExporter, self).__init__(self._run, 'progress_reporter textfile exporter')
+
+    def _run(self):
+        while True:
+            write_textfile(self.path)
+            if self._closed.wait(self.interval):
+                break
+        write_textfile(self.path)
+
+
+class HTTPExporter(_Exporter):
+    """ Serves the metrics of all active stages over HTTP from a background thread.
+
+    Parameters
+    ----------
+    port : int, optional, default=0
+        the port to listen on, 0 picks a free port (see the port attribute).
+    addr : str, optional, default='127.0.0.1'
+        the address to listen on.
+    """
+
+    def __init__(self, port=0, addr='127.0.0.1'):
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = exposition().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = HTTPServer((addr, port), Handler)
+        self.port = self._server.server_address[1]
+        super(HTTPExporter, self).__init__(self._server.serve_forever, 'progress_reporter http exporter')
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+        super(HTTPExporter, self).close()
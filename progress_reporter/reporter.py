@@ -1,24 +1,276 @@
+import itertools
+import os
+import sys
+import threading
+import warnings
+import weakref
 from numbers import Integral
+from time import time
 
 
-def _simple_memorize(f):
-    # cache function f result (takes no arguments)
-    from functools import wraps
-    @wraps(f)
-    def wrapper():
-        if not hasattr(f, 'res'):
-            f.res = f()
-        return f.res
-    return wrapper
+def _env_flag(name):
+    # None if the environment variable is not set, else its boolean value.
+    value = os.environ.get(name)
+    if value is None or value == '':
+        return None
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+# Progress can be hidden for all reporters of the process, e.g. in production batch jobs,
+# by set_show_progress(False) or by setting the environment variable PROGRESS_REPORTER_DISABLE=1.
+_disabled = bool(_env_flag('PROGRESS_REPORTER_DISABLE'))
+
+# Jupyter widgets are used if set_notebook_mode(True) has been called or the environment variable
+# PROGRESS_REPORTER_NOTEBOOK=1 is set (=0 to never use them). By default, the environment is detected.
+_notebook_mode = _env_flag('PROGRESS_REPORTER_NOTEBOOK')
+_notebook_detected = None
+
+# Progress is written by an output backend instead of being drawn, if set_output has been called
+# or the environment variable PROGRESS_REPORTER_OUTPUT=jsonl is set (JSON lines events to stdout).
+_output = os.environ.get('PROGRESS_REPORTER_OUTPUT') or None
+
+# Rates of finished stages are recorded to seed the ETA of later runs, if set_history has been called
+# or the environment variable PROGRESS_REPORTER_HISTORY names the file (see progress_reporter.history).
+_history = os.environ.get('PROGRESS_REPORTER_HISTORY') or None
+
+# progress bars of all registered stages, which have not been finished yet. They are read by the
+# exporters in progress_reporter.prometheus, updates do not touch this set.
+_active = weakref.WeakSet()
+_active_lock = threading.Lock()
+_active_ids = itertools.count()
+
+
+def _active_progressbars():
+    with _active_lock:
+        return list(_active)
+
+
+def set_show_progress(show):
+    """ Globally shows or hides the progress of all reporters.
+
+    If hidden, the progress methods of all reporters return immediately, regardless of their
+    show_progress attribute, and _progress_register hands out tickers doing nothing on update.
+    """
+    global _disabled
+    _disabled = not show
+
+
+def set_notebook_mode(enabled=None):
+    """ Sets whether progress bars are drawn as Jupyter widgets.
+
+    Parameters
+    ----------
+    enabled : bool or None, default=None
+        True or False forces widgets to be used or not. None (re-)enables the detection of the
+        environment and resets the cached result of a previous detection.
+    """
+    global _notebook_mode, _notebook_detected
+    _notebook_mode = None if enabled is None else bool(enabled)
+    _notebook_detected = None
+
+
+def set_output(output=None):
+    """ Sets the output of the progress of all reporters, which have no output of their own.
+
+    Parameters
+    ----------
+    output : object, str or None, default=None
+        None draws progress bars (in the terminal or as Jupyter widgets). 'jsonl' writes JSON lines
+        events to stdout. Otherwise an output backend like progress_reporter.jsonl.JSONLinesOutput.
+    """
+    global _output
+    _output = _output_backend(output)
+
+
+def _output_backend(output):
+    if not isinstance(output, str):
+        return output
+    if output == 'jsonl':
+        from .jsonl import JSONLinesOutput
+        return JSONLinesOutput()
+    raise ValueError('unknown progress output {!r}, expected None, "jsonl" or an output backend'.format(output))
+
+
+def set_history(history=None):
+    """ Sets where the rates of finished stages are recorded, to seed the ETA of later runs.
+
+    Parameters
+    ----------
+    history : str, progress_reporter.history.History or None, default=None
+        the path of the history file, a History or None to neither record nor seed rates.
+    """
+    global _history
+    _history = _history_store(history)
+
+
+def _history_store(history):
+    if not isinstance(history, str):
+        return history
+    from .history import History
+    return History(history)
+
+
+def _default_history():
+    # the environment variable is only resolved on first use, to keep importing this package cheap.
+    global _history
+    if isinstance(_history, str):
+        _history = _history_store(_history)
+    return _history
+
+
+def _default_output():
+    # the environment variable is only resolved on first use, to keep importing this package cheap.
+    global _output
+    if isinstance(_output, str):
+        _output = _output_backend(_output)
+    return _output
+
+
+class _StageTicker(object):
+    """ Handle to report the progress of a single stage from tight loops.
+
+    Increments are only accumulated locally; the progress bar and the registered
+    callbacks are invoked once enough increments have been gathered to reach the ``miniters``
+    of the bar, while the amount is doubled on every flush, which did not redraw the bar
+    (``mininterval`` not yet reached). In between, an update costs an integer addition and a comparison.
+    Once the bar misses its ``maxinterval`` deadline, e.g. because the rate dropped, the monitor
+    of the bar wakes the ticker up, so that it flushes on its next update.
+
+    Instances are returned by :meth:`ProgressReporter._progress_register`.
+    """
+    __slots__ = ('stage', '_reporter', '_pg', '_n', '_pushed', '_next_n', '_step', '_last_print_n')
+
+    def __init__(self, reporter, stage, pg):
+        self.stage = stage
+        self._reporter = reporter
+        self._pg = pg
+        self._n = self._pushed = 0
+        self._step = 1
+        self._last_print_n = pg.last_print_n
+        self._next_n = 1
+
+    def update(self, increment=1):
+        """ Increments the progress of the stage by the given amount. """
+        self._n += increment
+        if self._n >= self._next_n:
+            self.flush()
+
+    def flush(self):
+        """ Hands over the accumulated increments to the progress bar and callbacks. """
+        pg = self._pg
+        if not pg:
+            return
+        pending = self._n - self._pushed
+        if pending:
+            self._pushed = self._n
+            self._reporter._progress_update(pending, stage=self.stage)
+            # As long as the bar did not redraw (mininterval not yet reached), we double the
+            # amount of increments to gather before the next flush. This bounds the number of
+            # flushes between two redraws without calling time() on every increment.
+            if pg.last_print_n != self._last_print_n:
+                self._last_print_n = pg.last_print_n
+                self._step = 1
+            else:
+                self._step <<= 1
+        self._next_n = self._n + max(self._step, int(pg.miniters))
+
+    def _wake(self):
+        # called by the monitor thread, so only the owning thread flushes.
+        if self._pg is not None:
+            self._step = 1
+            self._next_n = 0
+
+    def _close(self):
+        self.flush()
+        self._pg._pg_ticker = None
+        self._pg = None
+        self._next_n = float('inf')
+
+
+class _NullTicker(object):
+    """ Ticker of stages without a progress bar (hidden or too few work), updates do nothing. """
+    __slots__ = ('stage', )
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def update(self, increment=1):
+        pass
+
+    def flush(self):
+        pass
+
+    def _close(self):
+        pass
+
+
+class _ShardedTicker(object):
+    """ Ticker of thread-safe stages, updates go to the shard of the calling thread. """
+    __slots__ = ('stage', 'update')
+
+    def __init__(self, stage, counter):
+        self.stage = stage
+        self.update = counter.update
+
+    def flush(self):
+        pass
+
+    def _close(self):
+        pass
+
+
+class _BatchedCallback(object):
+    """ Wraps a progress callback, which should only be invoked with aggregated increments.
+
+    The callback is fired once at least ``batch_increments`` increments have been gathered or,
+    on the next redraw of the progress bar, if ``batch_interval`` seconds have passed since
+    the last invocation. Both conditions are checked by comparing against the state of the
+    progress bar, so no clock has to be read for updates not causing a dispatch.
+    """
+    __slots__ = ('call_back', 'batch_increments', 'batch_interval', 'next_n', 'next_t', '_n', '_t')
+
+    def __init__(self, call_back, batch_increments=None, batch_interval=None):
+        self.call_back = call_back
+        self.batch_increments = batch_increments
+        self.batch_interval = batch_interval
+        self._n = 0
+        self._t = None
+        self.next_n = batch_increments if batch_increments else float('inf')
+        self.next_t = time() + batch_interval if batch_interval else float('inf')
+
+    def dispatch(self, stage, pg):
+        now = pg._time()
+        increment = pg.n - self._n
+        elapsed = now - (self._t if self._t is not None else pg.start_t)
+        self._n = pg.n
+        self._t = now
+        if self.batch_increments:
+            self.next_n = pg.n + self.batch_increments
+        if self.batch_interval:
+            self.next_t = now + self.batch_interval
+        self.call_back(stage, pg, increment=increment, elapsed=elapsed,
+                       rate=increment / elapsed if elapsed else None)
 
 
-@_simple_memorize
 def _attached_to_ipy_notebook_with_widgets():
+    """ whether progress bars should be drawn as Jupyter widgets.
+
+    The result of the detection is cached, see set_notebook_mode to override or reset it.
+    """
+    global _notebook_detected
+    if _notebook_mode is not None:
+        return _notebook_mode
+    if _notebook_detected is None:
+        _notebook_detected = _detect_ipy_notebook_with_widgets()
+    return _notebook_detected
+
+
+def _detect_ipy_notebook_with_widgets():
+    # A Jupyter kernel has imported IPython long before any progress is registered. So if it has
+    # not been imported yet, we are not attached to a notebook and avoid the costly imports.
+    if 'IPython' not in sys.modules:
+        return False
     try:
-        # check for widgets
-        import ipywidgets
-        if ipywidgets.version_info[0] < 4:
-            raise ImportError()
         # check for ipython kernel
         from IPython import get_ipython
         ip = get_ipython()
@@ -26,45 +278,308 @@ def _attached_to_ipy_notebook_with_widgets():
             return False
         if not getattr(ip, 'kernel', None):
             return False
+        # check for widgets
+        import ipywidgets
+        if ipywidgets.version_info[0] < 4:
+            raise ImportError()
         # No further checks are feasible
         return True
     except ImportError:
         return False
 
 
-class ProgressReporter(object):
+class _ParentLink(object):
+    """ Lets the progress of a child stage flow into its parent stage.
+
+    A child with the given weight accounts for weight units of the work of its parent, rounded
+    to whole units. As the child progresses, the parent is updated by whole units, but only when
+    the bar of the child has been redrawn, so an update of a nested stage costs O(depth) per redraw.
+    """
+    __slots__ = ('parent', 'weight', 'total', 'pushed', 'last_print_n')
+
+    def __init__(self, parent, weight, total):
+        self.parent = parent
+        # the parent counts whole units, like the combined bar (see combined.units).
+        self.weight = int(round(weight))
+        self.total = total
+        self.pushed = 0
+        self.last_print_n = None
+
+    def propagate(self, pg):
+        if pg.last_print_n != self.last_print_n:
+            self.last_print_n = pg.last_print_n
+            self._push(int(self.weight * min(pg.n, self.total) / self.total))
+
+    def finish(self):
+        self._push(self.weight)
+
+    def _push(self, target):
+        parent = self.parent
+        increment = target - self.pushed
+        # tickers of finished stages and stages without progress bar have no bar.
+        if increment > 0 and getattr(parent, '_pg', None):
+            self.pushed = target
+            parent._reporter._progress_update(increment, stage=parent.stage)
+
+
+class _StageContext(object):
+    # finishes the given stages of a reporter on exit, see ProgressReporter._progress_context
+    __slots__ = ('_reporter', '_stage')
+
+    def __init__(self, reporter, stage):
+        self._reporter = reporter
+        self._stage = stage
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        reporter, stage = self._reporter, self._stage
+        if stage == 'all':
+            keys = tuple(reporter._prog_rep_progressbars.keys())
+            for s in keys:
+                reporter._progress_force_finish(stage=s)
+        elif isinstance(stage, (tuple, list)):
+            for s in stage:
+                reporter._progress_force_finish(s)
+        else:
+            reporter._progress_force_finish(stage)
+        return False
+
+
+class _ProgressState(object):
+    """ Holds the state of a ProgressReporter, it is created on first use. """
+    __slots__ = ('show_progress', 'progressbars', 'tickers', 'callbacks', 'batched_callbacks',
+                 'listener', 'sampler', 'output', 'parents', 'combined', 'shards')
+
+    def __init__(self, show_progress=True):
+        self.show_progress = show_progress
+        # output backend of this reporter, None for the global one (see set_output).
+        self.output = None
+        # progressbar representation, ticker, callbacks and batched callbacks per stage.
+        # These are created on demand to keep the memory footprint of unused reporters small.
+        self.progressbars = None
+        self.tickers = None
+        self.callbacks = None
+        self.batched_callbacks = None
+        # receives progress sent by worker processes, created on demand
+        self.listener = None
+        # samples shared counters of stages, created on demand
+        self.sampler = None
+        # links of nested stages to their parent stage, created on demand
+        self.parents = None
+        # the bar shared by all stages, if they are combined (see ProgressReporter._pg_combined)
+        self.combined = None
+        # counters of thread-safe stages, created on demand
+        self.shards = None
+
+
+class ProgressReporterMixIn(object):
     """ Derive from this class to make some protected methods available to register
     and update status of different stages of an algorithm.
+
+    All state is kept in a single object, which is created on first use and stored in the
+    attribute ``_progress_state``. This class defines no slots, so it does not change the
+    instance layout of the classes it is mixed into. These need a __dict__ or have to declare
+    the slot themselves:
+
+    .. code:: python
+
+        class Worker(ProgressReporterMixIn):
+            __slots__ = ('n_jobs', '_progress_state')
     """
+    __slots__ = ()
+
     _pg_threshold = 2
+    # if True, progress bars are drawn by a background thread at a fixed rate instead of
+    # the thread calling _progress_update.
+    _pg_background_rendering = False
+    # if True, only the changed columns of a bar are written to terminals, instead of the whole line
+    # (see progress_reporter.terminal._DiffPrinter). Nothing else may write to the terminal then.
+    _pg_diff_rendering = False
+    # if True, all stages feed a single progress bar, each with the share given by its weight
+    # (see progress_reporter.combined).
+    _pg_combined = False
 
     # Note: this class has intentionally no constructor, because it is more
     # comfortable for the user of this class (who is then not in the need to call it).
 
+    @property
+    def _prog_rep_state(self):
+        # The attribute is either unset (progress is shown, nothing has been registered yet),
+        # None (progress is hidden, nothing has been registered yet) or the state object.
+        try:
+            state = self._progress_state
+            if state is not None:
+                return state
+            show_progress = False
+        except AttributeError:
+            show_progress = True
+        state = _ProgressState(show_progress)
+        self.__set_state(state)
+        return state
+
+    def __set_state(self, state):
+        try:
+            self._progress_state = state
+        except AttributeError:
+            raise TypeError("{} defines __slots__, so it has to declare the slot '_progress_state' "
+                            "(see ProgressReporterMixIn).".format(type(self).__name__))
+
     @property
     def show_progress(self):
         """ whether to show the progress of heavy calculations on this object. """
-        if not hasattr(self, "_show_progress"):
-            self._show_progress = True
-        return self._show_progress
+        if _disabled:
+            return False
+        try:
+            state = self._progress_state
+        except AttributeError:
+            return True
+        return state is not None and state.show_progress
 
     @show_progress.setter
     def show_progress(self, val):
-        self._show_progress = bool(val)
+        val = bool(val)
+        try:
+            state = self._progress_state
+        except AttributeError:
+            state = None
+        if state is not None:
+            state.show_progress = val
+        elif val:
+            # back to the default of a reporter without state.
+            try:
+                del self._progress_state
+            except AttributeError:
+                pass
+        else:
+            # a hidden reporter does not need a state object, until something is registered.
+            self.__set_state(None)
+
+    @property
+    def _progress_output(self):
+        """ output backend of the progress of this reporter, None to use the global one (see set_output). """
+        try:
+            state = self._progress_state
+        except AttributeError:
+            return None
+        return state.output if state is not None else None
+
+    @_progress_output.setter
+    def _progress_output(self, output):
+        self._prog_rep_state.output = _output_backend(output)
 
     @property
     def _prog_rep_progressbars(self):
         # stores progressbar representation per stage
-        if not hasattr(self, '_ProgressReporter__prog_rep_progressbars'):
-            self.__prog_rep_progressbars = {}
-        return self.__prog_rep_progressbars
+        state = self._prog_rep_state
+        if state.progressbars is None:
+            state.progressbars = {}
+        return state.progressbars
+
+    @property
+    def _prog_rep_tickers(self):
+        # stores the ticker handle per stage
+        state = self._prog_rep_state
+        if state.tickers is None:
+            state.tickers = {}
+        return state.tickers
 
     @property
     def _prog_rep_callbacks(self):
         # store callback by stage
-        if not hasattr(self, '_ProgressReporter__prog_rep_callbacks'):
-            self.__prog_rep_callbacks = {}
-        return self.__prog_rep_callbacks
+        state = self._prog_rep_state
+        if state.callbacks is None:
+            state.callbacks = {}
+        return state.callbacks
+
+    @property
+    def _prog_rep_batched_callbacks(self):
+        # store batched callbacks by stage
+        state = self._prog_rep_state
+        if state.batched_callbacks is None:
+            state.batched_callbacks = {}
+        return state.batched_callbacks
+
+    @property
+    def _prog_rep_listener(self):
+        return self._prog_rep_state.listener
+
+    @property
+    def _prog_rep_sampler(self):
+        return self._prog_rep_state.sampler
+
+    def _progress_worker_proxy(self, stage=0, batch_size=100):
+        """ Creates a handle to report progress of the given stage from other processes.
+
+        The returned proxy can be pickled and send to worker processes (e.g. via
+        multiprocessing.Pool or concurrent.futures.ProcessPoolExecutor). It has an
+        ``update(increment)`` method, which only accumulates the increments locally and
+        sends them to this process in batches. The progress bar is drawn by this process only.
+
+        Parameters
+        ----------
+        stage : int, optional, default=0
+            The already registered stage to report progress for.
+        batch_size : int, optional, default=100
+            Amount of increments to accumulate in the worker before sending them.
+            Remaining increments are sent on ``flush()`` or if the proxy is garbage collected.
+
+        Returns
+        -------
+        proxy : progress_reporter.parallel.StageProxy
+        """
+        from .parallel import StageProxy, _ProgressListener
+        pg = self.__check_stage_registered(stage) if self.show_progress else None
+        if not pg:
+            return StageProxy(None, None, stage, batch_size=batch_size)
+        state = self._prog_rep_state
+        if state.listener is None:
+            state.listener = _ProgressListener(self)
+        return state.listener.proxy(stage, batch_size=batch_size)
+
+    def _progress_shared_counter(self, stage=0, slots=256):
+        """ Creates a counter in shared memory to report progress of the given stage.
+
+        The returned counter can be incremented by ``update(increment)`` from many threads and
+        processes (it can be pickled) without any locking. A single background thread of this
+        process samples its value at the display rate and updates the progress bar accordingly,
+        so the cost of updates is independent of the cost of rendering.
+
+        Parameters
+        ----------
+        stage : int, optional, default=0
+            The already registered stage to report progress for.
+        slots : int, optional, default=256
+            Maximum number of threads concurrently incrementing the counter.
+
+        Returns
+        -------
+        counter : progress_reporter.parallel.SharedCounter
+        """
+        from .parallel import SharedCounter, _NullCounter, _SharedCounterSampler
+        pg = self.__check_stage_registered(stage) if self.show_progress else None
+        if not pg:
+            return _NullCounter()
+        state = self._prog_rep_state
+        if state.sampler is None:
+            state.sampler = _SharedCounterSampler(self, interval=pg.mininterval or 0.1)
+        counter = state.sampler.counter(stage)
+        if counter is None:
+            counter = SharedCounter.create(slots=slots)
+            state.sampler.add(stage, counter)
+        return counter
+
+    def __thread_safe_stage(self, stage, pg):
+        from .parallel import ThreadShardedCounter, _SharedCounterSampler
+        state = self._prog_rep_state
+        if state.sampler is None:
+            state.sampler = _SharedCounterSampler(self, interval=pg.mininterval or 0.1)
+        if state.shards is None:
+            state.shards = {}
+        counter = state.shards[stage] = ThreadShardedCounter()
+        state.sampler.add(stage, counter)
+        return _ShardedTicker(stage, counter)
 
     def _progress_context(self, stage='all'):
         """
@@ -77,29 +592,18 @@ class ProgressReporter(object):
         -------
         context manager
         """
-        from contextlib import contextmanager
-        @contextmanager
-        def ctx():
-            try:
-                yield
-            finally:
-                if stage == 'all':
-                    keys = tuple(self._prog_rep_progressbars.keys())
-                    for s in keys:
-                        self._progress_force_finish(stage=s)
-                elif isinstance(stage, (tuple, list)):
-                    for s in stage:
-                        self._progress_force_finish(s)
-                else:
-                    self._progress_force_finish(stage)
-        return ctx()
+        return _StageContext(self, stage)
 
-    def __check_stage_registered(self, stage):
-        if stage not in self._prog_rep_progressbars:
+    def __check_stage_registered(self, stage, progressbars=None):
+        if progressbars is None:
+            progressbars = self._prog_rep_progressbars
+        try:
+            return progressbars[stage]
+        except KeyError:
             raise RuntimeError('call _progress_register(amount_of_work, stage={}) on this instance first!'.format(stage))
-        return self._prog_rep_progressbars[stage]
 
-    def _progress_register(self, amount_of_work, description='', stage=0, tqdm_args=None):
+    def _progress_register(self, amount_of_work, description='', stage=0, tqdm_args=None, estimator=None,
+                           parent=None, weight=1, thread_safe=False):
         """ Registers a progress which can be reported/displayed via a progress bar.
 
         Parameters
@@ -112,9 +616,32 @@ class ProgressReporter(object):
             If the algorithm has multiple different stages (eg. calculate means
             in the first pass over the data, calculate covariances in the second),
             one needs to estimate different times of arrival.
+        estimator : progress_reporter.estimators.Estimator, optional
+            Estimates the rate and thereby the ETA of the stage, instead of the exponential
+            moving average of tqdm. Every stage needs its own estimator instance.
+        parent : _StageTicker, optional
+            The ticker returned by registering the parent stage (possibly of another reporter),
+            if this stage is part of the work of the parent stage. The progress of this stage
+            then flows into the progress of the parent stage and its bar is removed, once done.
+        weight : int or float, optional, default=1
+            Amount of work of the parent stage this stage accounts for, e.g. its expected cost,
+            rounded to whole units of the parent. If the stages of this reporter are combined into a single bar (_pg_combined),
+            the share of this stage of the bar, relative to the weights of the other stages.
+        thread_safe : bool, optional, default=False
+            If True, the progress of the stage may be updated from many threads at once. Every
+            thread counts in a shard of its own without locking, the shards are merged by a
+            background thread, which also draws the bar (see ThreadShardedCounter).
+
+        Returns
+        -------
+        ticker : _StageTicker
+            A handle with an ``update(increment)`` method, which is a faster alternative to
+            :meth:`_progress_update` for tight loops, because it only dispatches to the
+            progress bar and callbacks if the bar could possibly be redrawn.
+            If no progress is shown for the stage, the handle does nothing on update.
         """
         if not self.show_progress:
-            return
+            return _NullTicker(stage)
 
         if tqdm_args is None:
             tqdm_args = {}
@@ -125,25 +652,73 @@ class ProgressReporter(object):
         # if we do not have enough work to do for the overhead of a progress bar just dont create a bar.
         if amount_of_work <= ProgressReporter._pg_threshold:
             pg = None
+        elif self._pg_combined:
+            pg = self.__combined_stage(amount_of_work, description, tqdm_args, weight)
         else:
-            import sys
-            # progress_reporter < 2.0 print to stdout.
-            if 'file' not in tqdm_args:
-                tqdm_args['file'] = sys.stdout
-            if 'dynamic_ncols' not in tqdm_args:
-                tqdm_args['dynamic_ncols'] = True
-            if 'description' in tqdm_args:
-                tqdm_args.pop('description')
-            args = dict(total=amount_of_work, desc=description, **tqdm_args)
-            if _attached_to_ipy_notebook_with_widgets():
-                from .notebook import my_tqdm_notebook
-                pg = my_tqdm_notebook(leave=False, **args)
-            else:
-                from ._vendor import tqdm
-                pg = tqdm.tqdm(leave=True, **args)
+            # the progress of nested stages is shown by their parent, once done.
+            pg = self.__progressbar(stage, amount_of_work, description, tqdm_args, leave=parent is None)
 
+        state = self._prog_rep_state
+        if state.shards and stage in state.shards:
+            # the stage is registered again, its former counter belongs to the former bar.
+            state.sampler.remove(stage)
+            del state.shards[stage]
         self._prog_rep_progressbars[stage] = pg
-        assert stage in self._prog_rep_progressbars
+        if parent is not None:
+            if state.parents is None:
+                state.parents = {}
+            state.parents[stage] = _ParentLink(parent, weight, amount_of_work)
+        if not pg:
+            return _NullTicker(stage)
+        if estimator is not None:
+            estimator.update(pg.n, pg.start_t)
+            pg.estimator = estimator
+        history = _default_history()
+        if history is not None:
+            pg._pg_history_key = key = history.key(self, stage, description)
+            rate = history.rate(key)
+            if rate:
+                # the rate of earlier runs, until the first redraws have measured this one.
+                if estimator is not None:
+                    estimator.seed(rate)
+                else:
+                    pg.avg_time = 1 / rate
+        pg._pg_stage = stage
+        pg._pg_reporter = type(self).__name__
+        with _active_lock:
+            pg._pg_id = next(_active_ids)
+            _active.add(pg)
+        if thread_safe:
+            return self.__thread_safe_stage(stage, pg)
+        ticker = _StageTicker(self, stage, pg)
+        pg._pg_ticker = ticker
+        self._prog_rep_tickers[stage] = ticker
+        return ticker
+
+    def __progressbar(self, stage, amount_of_work, description, tqdm_args, leave=True):
+        output = self._prog_rep_state.output or _default_output()
+        tqdm_args.pop('description', None)
+        if output is not None:
+            return output.progressbar(stage, total=amount_of_work, desc=description, **tqdm_args)
+        # progress_reporter < 2.0 print to stdout.
+        if 'file' not in tqdm_args:
+            tqdm_args['file'] = sys.stdout
+        if 'dynamic_ncols' not in tqdm_args:
+            tqdm_args['dynamic_ncols'] = True
+        args = dict(total=amount_of_work, desc=description, **tqdm_args)
+        if _attached_to_ipy_notebook_with_widgets():
+            from .notebook import my_tqdm_notebook
+            return my_tqdm_notebook(leave=False, **args)
+        from .terminal import my_tqdm
+        return my_tqdm(leave=leave, background=self._pg_background_rendering, diff=self._pg_diff_rendering, **args)
+
+    def __combined_stage(self, amount_of_work, description, tqdm_args, weight):
+        from .combined import COMBINED_FORMAT, CombinedBar, units
+        state = self._prog_rep_state
+        if state.combined is None or state.combined.closed:
+            tqdm_args.setdefault('bar_format', COMBINED_FORMAT)
+            state.combined = CombinedBar(self.__progressbar(None, units(weight), description, tqdm_args))
+        return state.combined.stage(amount_of_work, description, weight)
 
     def _progress_set_description(self, stage, description):
         """ set description of an already existing progress """
@@ -151,7 +726,7 @@ class ProgressReporter(object):
         if pg:
             pg.set_description(description, refresh=True)
 
-    def register_progress_callback(self, call_back, stage=0):
+    def register_progress_callback(self, call_back, stage=0, batch_increments=None, batch_interval=None):
         """ Registers the progress reporter.
         Parameters
         ----------
@@ -162,12 +737,31 @@ class ProgressReporter(object):
             3. optional \*args and named keywords (\*\*kw), for future changes
         stage: int, optional, default=0
             The stage you want the given call back function to be fired.
+        batch_increments: int, optional, default=None
+            If given, the call back is not fired on every update, but only once this amount
+            of increments has been accumulated.
+        batch_interval: float, optional, default=None
+            If given, the call back is not fired on every update, but at most every
+            batch_interval seconds (checked whenever the progress bar is redrawn).
+
+        Notes
+        -----
+        If batch_increments or batch_interval is given, the call back receives the aggregated
+        progress as named keywords: 'increment' (summed increments since the last call),
+        'elapsed' (seconds since the last call) and 'rate' (increments per second).
+        It is fired a last time when the stage is finished by _progress_force_finish.
         """
         if not self.show_progress:
             return
 
         assert callable(call_back), "given call_back is not callable: {}".format(call_back)
 
+        if batch_increments or batch_interval:
+            batched = _BatchedCallback(call_back, batch_increments=batch_increments,
+                                       batch_interval=batch_interval)
+            self._prog_rep_batched_callbacks.setdefault(stage, []).append(batched)
+            return
+
         if stage not in self._prog_rep_callbacks:
             self._prog_rep_callbacks[stage] = []
 
@@ -184,42 +778,186 @@ class ProgressReporter(object):
             Current stage of the algorithm, 0 or greater
 
         """
-        if not self.show_progress:
+        if _disabled:
+            return
+        try:
+            state = self._progress_state
+        except AttributeError:
+            state = self._prog_rep_state
+        if state is None or not state.show_progress:
             return
 
-        pg = self.__check_stage_registered(stage)
+        shards = state.shards
+        if shards and stage in shards:
+            # thread-safe stages only count, their sampler applies the merged counts to the bar.
+            shards[stage].update(numerator_increment)
+            return
+
+        pg = self.__check_stage_registered(stage, state.progressbars)
         if not pg:
             return
+        self.__apply(state, pg, numerator_increment, stage, kw)
 
+    def _progress_merge(self, numerator_increment, stage=0):
+        # applies increments counted elsewhere (e.g. by the shards of a thread-safe stage) to the bar.
+        state = self._prog_rep_state
+        pg = self.__check_stage_registered(stage, state.progressbars)
+        if pg:
+            self.__apply(state, pg, numerator_increment, stage, {})
+
+    def __apply(self, state, pg, numerator_increment, stage, kw):
         diff = pg.total - numerator_increment
         if diff < 0:
-            import warnings
             warnings.warn("This should not happen. An caller pretended to have "
                           "achieved more work than registered")
         else:
             pg.update(numerator_increment)
-            if stage in self._prog_rep_callbacks:
-                for callback in self._prog_rep_callbacks[stage]:
-                    callback(stage, pg, **kw)
+            self.__dispatch(state, pg, stage, kw)
+
+    def __dispatch(self, state, pg, stage, kw):
+        # calls the callbacks of the stage and lets its progress flow into its parent stage.
+        callbacks = state.callbacks
+        if callbacks and stage in callbacks:
+            for callback in callbacks[stage]:
+                callback(stage, pg, **kw)
+        batched_callbacks = state.batched_callbacks
+        if batched_callbacks and stage in batched_callbacks:
+            for batched in batched_callbacks[stage]:
+                if pg.n >= batched.next_n or pg.last_print_t >= batched.next_t:
+                    batched.dispatch(stage, pg)
+        parents = state.parents
+        if parents and stage in parents:
+            parents[stage].propagate(pg)
+
+    def _progress_iterate(self, iterable, amount_of_work=None, description='', stage=0, tqdm_args=None):
+        """ Wraps an iterable and counts every item as one piece of work of the stage.
+
+        The items are counted by the loop of the progress bar (tqdm.__iter__), which keeps its
+        state in local variables and only reads the clock every miniters items. So the callbacks
+        of the stage are called on redraws of the bar only, instead of for every item. The stage
+        is finished once the iterable is exhausted.
+
+        Parameters
+        ----------
+        iterable : iterable
+        amount_of_work : int, optional
+            If given, the stage is registered with this amount of work. Otherwise an already
+            registered stage is used or, if there is none, the stage is registered with the
+            length of the iterable.
+        description : str, optional
+            Description of the stage, if it is registered by this call.
+        stage : int, optional, default=0
+        tqdm_args : dict, optional
+            Passed to _progress_register, if the stage is registered by this call.
+
+        Returns
+        -------
+        iterator over the items of iterable
+        """
+        if not self.show_progress:
+            return iter(iterable)
+        if amount_of_work is None and stage not in self._prog_rep_progressbars:
+            try:
+                amount_of_work = len(iterable)
+            except TypeError:
+                raise ValueError('the iterable has no length, so amount_of_work has to be given '
+                                 'or stage {} has to be registered already.'.format(stage))
+        if amount_of_work is not None:
+            self._progress_register(amount_of_work, description=description, stage=stage, tqdm_args=tqdm_args)
+        return self.__iterate(iterable, stage)
+
+    def __iterate(self, iterable, stage):
+        state = self._prog_rep_state
+        pg = state.progressbars[stage]
+        if pg:
+            from ._vendor.tqdm import tqdm
+        try:
+            if (not pg or not isinstance(pg, tqdm) or getattr(pg, 'background', False)
+                    or state.shards and stage in state.shards):
+                # bars drawn by a renderer, combined and thread-safe stages (or none at all) only count.
+                ticker = state.tickers.get(stage) if state.tickers else None
+                if ticker is not None:
+                    update = ticker.update
+                    for item in iterable:
+                        yield item
+                        update(1)
+                else:
+                    for item in iterable:
+                        yield item
+                        self._progress_update(1, stage=stage)
+            else:
+                pg.iterable = iterable
+                # the loop of tqdm does not call update, which hands the bar over to the monitor.
+                watch = getattr(pg, '_watch', None)
+                last_print_n = pg.last_print_n
+                for item in pg:
+                    yield item
+                    if pg.last_print_n != last_print_n:
+                        last_print_n = pg.last_print_n
+                        if watch is not None:
+                            watch()
+                        self.__dispatch(state, pg, stage, {})
+                # the bar has been closed by its loop, callbacks get the final progress nevertheless.
+                if pg.n != last_print_n:
+                    self.__dispatch(state, pg, stage, {})
+        finally:
+            # loops left early and generators collected before being exhausted finish the stage as well.
+            if stage in state.progressbars:
+                self._progress_force_finish(stage)
 
     def _progress_force_finish(self, stage=0, description=None):
         """ forcefully finish the progress for given stage """
         if not self.show_progress:
             return
 
-        pg = self.__check_stage_registered(stage)
+        state = self._prog_rep_state
+        pg = self.__check_stage_registered(stage, state.progressbars)
+
+        ticker = self._prog_rep_tickers.pop(stage, None)
+        if ticker is not None:
+            ticker._close()
+        if state.sampler is not None:
+            # a final sample merges all increments counted for the stage.
+            state.sampler.remove(stage)
+        if state.shards:
+            state.shards.pop(stage, None)
+        link = state.parents.pop(stage, None) if state.parents else None
+        if link is not None:
+            # the parent gets the whole weight of this stage, even if it had no bar.
+            link.finish()
 
         if not pg:
             return
 
         pg.desc = description
         diff = pg.total - pg.n
+        history = _default_history()
+        if history is not None and diff == 0 and hasattr(pg, '_pg_history_key'):
+            # only runs, which did all of their work, tell the rate of the stage.
+            elapsed = pg._time() - pg.start_t
+            if elapsed > 0:
+                history.record(pg._pg_history_key, pg.n / elapsed)
         if diff > 0:
             pg.update(diff)
         pg.refresh(nolock=True)
+        if state.batched_callbacks:
+            for batched in state.batched_callbacks.pop(stage, ()):
+                batched.dispatch(stage, pg)
+        with _active_lock:
+            _active.discard(pg)
         pg.close()
-        self._prog_rep_progressbars.pop(stage, None)
-        self._prog_rep_callbacks.pop(stage, None)
+        state.progressbars.pop(stage, None)
+        if state.combined is not None and state.combined.closed:
+            # the bar writes to a terminal, reporters have to stay picklable after their run.
+            state.combined = None
+        if state.callbacks:
+            state.callbacks.pop(stage, None)
+        if not state.progressbars and state.listener is not None:
+            state.listener.close()
+            state.listener = None
+        if state.sampler is not None and state.sampler.empty:
+            state.sampler.close()
+            state.sampler = None
 
     def _progress_refresh(self, stage=0):
         if not self.show_progress:
@@ -239,7 +977,14 @@ class ProgressReporter(object):
         return tuple(self._prog_rep_progressbars.keys())
 
 
-ProgressReporterMixIn = ProgressReporter
+class ProgressReporter(ProgressReporterMixIn):
+    """ Derive from this class to make some protected methods available to register
+    and update status of different stages of an algorithm.
+
+    The state is kept in the __dict__ of instances, so this class can be combined with any
+    other base class (e.g. dict or Exception). Classes defining __slots__ to avoid a __dict__
+    should derive from ProgressReporterMixIn instead.
+    """
 
 class ProgressReporter_(ProgressReporter):
     """ class to report progress for multiple stages. Suitable for composition.
@@ -248,12 +993,33 @@ class ProgressReporter_(ProgressReporter):
     def context(self, stage='all'):
         return self._progress_context(stage=stage)
 
-    def register(self, amount_of_work, description='', stage=0, tqdm_args=None):
-        self._progress_register(amount_of_work=amount_of_work, description=description, stage=stage, tqdm_args=tqdm_args)
+    def register(self, amount_of_work, description='', stage=0, tqdm_args=None, estimator=None, parent=None,
+                 weight=1, thread_safe=False):
+        return self._progress_register(amount_of_work=amount_of_work, description=description, stage=stage,
+                                       tqdm_args=tqdm_args, estimator=estimator, parent=parent, weight=weight,
+                                       thread_safe=thread_safe)
 
     def update(self, increment, stage=0):
         self._progress_update(increment, stage=stage)
 
+    def iterate(self, iterable, amount_of_work=None, description='', stage=0, tqdm_args=None):
+        return self._progress_iterate(iterable, amount_of_work=amount_of_work, description=description,
+                                      stage=stage, tqdm_args=tqdm_args)
+
+    def worker_proxy(self, stage=0, batch_size=100):
+        return self._progress_worker_proxy(stage=stage, batch_size=batch_size)
+
+    def shared_counter(self, stage=0, slots=256):
+        return self._progress_shared_counter(stage=stage, slots=slots)
+
+    @property
+    def output(self):
+        return self._progress_output
+
+    @output.setter
+    def output(self, output):
+        self._progress_output = output
+
     def set_description(self, description, stage=0):
         self._progress_set_description(description=description, stage=stage)
 
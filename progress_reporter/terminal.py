@@ -0,0 +1,495 @@
+import sys
+import threading
+from heapq import heappop, heappush
+from time import time
+import weakref
+
+from . import _monitor
+from ._format import CompiledMeterMixin
+from ._vendor.tqdm import tqdm
+from ._vendor.tqdm._utils import _term_move_up
+
+
+class _Renderer(threading.Thread):
+    """ Background thread, which owns the output of all progress bars rendered in background.
+
+    Bars rendered in background only record their counters on update. The renderer
+    redraws all bars, which have made progress, at a fixed refresh rate.
+    """
+    interval = 0.1
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, interval=None):
+        super(_Renderer, self).__init__(name='progress_reporter renderer')
+        self.daemon = True
+        if interval is not None:
+            self.interval = interval
+        self.bars = set()
+        self.stopped = threading.Event()
+
+    @classmethod
+    def shared(cls):
+        """ the renderer thread shared by all bars of this process, if running. """
+        return cls._shared
+
+    @classmethod
+    def add_shared(cls, bar):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+                cls._shared.start()
+            cls._shared.bars.add(bar)
+            return cls._shared
+
+    def discard(self, bar):
+        with _Renderer._shared_lock:
+            self.bars.discard(bar)
+            if not self.bars:
+                self.stop()
+                if _Renderer._shared is self:
+                    _Renderer._shared = None
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.render()
+
+    def render(self):
+        with my_tqdm.get_lock():
+            _render_all(self.bars)
+
+    def stop(self):
+        self.stopped.set()
+        if threading.current_thread() is not self:
+            self.join()
+
+
+class _LoopRenderer(object):
+    """ Draws progress bars rendered in background from callbacks scheduled on an asyncio event loop.
+
+    Contrary to the renderer thread, no lock is acquired for drawing, because all bars owned by
+    this renderer are only updated from within the event loop.
+    """
+    interval = 0.1
+
+    def __init__(self, loop, interval=None):
+        # renderers are cached per loop, so we must not keep it alive.
+        self._loop = weakref.ref(loop)
+        if interval is not None:
+            self.interval = interval
+        self.bars = set()
+        self._handle = None
+
+    def add(self, bar):
+        self.bars.add(bar)
+        if self._handle is None:
+            self._handle = self._loop().call_later(self.interval, self._tick)
+
+    def discard(self, bar):
+        self.bars.discard(bar)
+        if not self.bars and self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _tick(self):
+        self.render()
+        self._handle = self._loop().call_later(self.interval, self._tick) if self.bars else None
+
+    def render(self):
+        _render_all(self.bars)
+
+
+# unchanged runs shorter than this are rewritten instead of skipped by a cursor movement.
+_MIN_SKIP = 6
+# block characters drawn by tqdm, which are as wide as an ASCII character.
+_DROP_BLOCKS = dict.fromkeys(range(0x2588, 0x2590))
+
+
+def _is_terminal(file):
+    # cursor movements are supported by ANSI terminals (and Windows terminals with colorama).
+    if not _term_move_up():
+        return False
+    try:
+        return file.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+
+def _changed_ranges(old, new):
+    """ returns the (start, end) column ranges of the line new, which differ from the line old. """
+    ranges = []
+    start = end = -1
+    for i, (a, b) in enumerate(zip(old, new)):
+        if a != b:
+            if start < 0:
+                start = i
+            elif i - end >= _MIN_SKIP:
+                ranges.append((start, end))
+                start = i
+            end = i + 1
+    if len(new) > len(old):
+        if start < 0:
+            start = len(old)
+        elif len(old) - end >= _MIN_SKIP:
+            ranges.append((start, end))
+            start = len(old)
+        end = len(new)
+    if start >= 0:
+        ranges.append((start, end))
+    return ranges
+
+
+def _diff(old, new):
+    """ returns the output transforming the line old into new, assuming the cursor is on this line. """
+    out = []
+    cursor = 0
+    for start, end in _changed_ranges(old, new):
+        if not out:
+            out.append('\r\x1b[{}C'.format(start) if start else '\r')
+        else:
+            out.append('\x1b[{}C'.format(start - cursor))
+        out.append(new[start:end])
+        cursor = end
+    if len(old) > len(new):
+        # erase the rest of the line
+        if not out:
+            out.append('\r\x1b[{}C'.format(len(new)) if new else '\r')
+        elif cursor < len(new):
+            out.append('\x1b[{}C'.format(len(new) - cursor))
+        out.append('\x1b[K')
+    return ''.join(out)
+
+
+class _DiffPrinter(object):
+    """ Prints the meter of a bar to a terminal, writing only the columns which changed since the last frame.
+
+    The cursor is moved to the changed column ranges with ANSI escape sequences. Frames containing
+    escape sequences or wide characters are written as a whole line, just as the first frame and
+    frames after the bar has moved to another line.
+
+    Other output to the terminal (e.g. a print) invalidates the line, so at least every interval
+    seconds a frame is written as a whole line to repair it.
+    """
+    __slots__ = ('_fp', '_bar', '_last', '_len', '_pos', '_full_t')
+
+    interval = 10.
+
+    def __init__(self, fp, bar):
+        self._fp = fp
+        # the bar owns its printer, so we must not keep it alive.
+        self._bar = weakref.ref(bar)
+        self._last = None
+        self._len = 0
+        self._pos = None
+        self._full_t = 0
+
+    def __call__(self, s):
+        pos = getattr(self._bar(), 'pos', None)
+        plain = '\x1b' not in s and (s.isascii() or s.translate(_DROP_BLOCKS).isascii())
+        now = time()
+        if self._last is None or pos != self._pos or not plain or now - self._full_t >= self.interval:
+            out = '\r' + s + ' ' * max(self._len - len(s), 0)
+            self._pos = pos
+            self._full_t = now
+        else:
+            out = _diff(self._last, s)
+        # the columns of other frames are unknown, so the next frame is written as a whole.
+        self._last = s if plain else None
+        self._len = len(s)
+        if out:
+            self._fp.write(out)
+            self._fp.flush()
+
+
+class _FrameWriter(object):
+    """ Wraps the file of progress bars to compose their output to frames.
+
+    Between begin() and end() everything written by a thread is collected, and on end() written to
+    the file with a single write and flush. Bars sharing a file share its writer, so a frame of the
+    renderer containing all bars costs one system call instead of about three per bar.
+    Outside of frames, writes are passed to the file.
+    """
+    # writers by id of their files, writers only live as long as the bars using them.
+    _writers = {}
+    _writers_lock = threading.Lock()
+
+    def __init__(self, file):
+        self._file = file
+        self._local = threading.local()
+
+    @classmethod
+    def of(cls, file):
+        """ the writer shared by all bars writing to file. """
+        if isinstance(file, _FrameWriter):
+            return file
+        key = id(file)
+        with cls._writers_lock:
+            ref = cls._writers.get(key)
+            writer = ref() if ref is not None else None
+            if writer is None or writer._file is not file:
+                writer = cls(file)
+                cls._writers[key] = weakref.ref(writer, lambda _, key=key: cls._writers.pop(key, None))
+            return writer
+
+    def begin(self):
+        local = self._local
+        depth = getattr(local, 'depth', 0)
+        if not depth:
+            local.buffer = []
+        local.depth = depth + 1
+
+    def end(self):
+        local = self._local
+        local.depth -= 1
+        if not local.depth:
+            frame = ''.join(local.buffer)
+            local.buffer = None
+            if frame:
+                self._file.write(frame)
+                self._file.flush()
+
+    def write(self, s):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            return self._file.write(s)
+        buffer.append(s)
+
+    def flush(self):
+        if getattr(self._local, 'buffer', None) is None:
+            self._file.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    # tqdm compares the files of bars, e.g. with sys.stderr.
+    def __eq__(self, other):
+        return other is self._file or isinstance(other, _FrameWriter) and other._file is self._file
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._file)
+
+
+class _PositionAllocator(object):
+    """ Assigns the rows (pos) of bars, without scanning all bars like tqdm.
+
+    Automatically positioned bars get the lowest free row, which is kept in a heap of free rows
+    below the highest used row. Bars with a fixed position (a negative pos) only occupy their row.
+    When a bar is released, the automatically positioned bars in the rows after it move up by one
+    row like with tqdm, so the bars keep their order and the rows stay compact. Only the rows after
+    the released one are looked at, instead of all bars.
+    """
+
+    def __init__(self):
+        # row -> weak reference to the bar, which is released by closing it on garbage collection.
+        self._bars = {}
+        self._free = []  # heap of free rows below _end, may contain rows taken in the meantime
+        self._end = 0  # all rows from here on are free
+
+    def _lowest_free(self):
+        free = self._free
+        while free and (free[0] >= self._end or free[0] in self._bars):
+            heappop(free)
+        return free[0] if free else self._end
+
+    def peek(self):
+        """ the row, a new bar would get. """
+        return self._lowest_free()
+
+    def acquire(self, bar):
+        row = self._lowest_free()
+        if row == self._end:
+            self._end += 1
+        else:
+            heappop(self._free)
+        self._bars[row] = weakref.ref(bar)
+        return row
+
+    def claim(self, row, bar):
+        """ marks the row as used by a bar with fixed position. """
+        for free in range(self._end, row):
+            heappush(self._free, free)
+        self._end = max(self._end, row + 1)
+        self._bars[row] = weakref.ref(bar)
+
+    def release(self, bar):
+        row = abs(bar.pos)
+        ref = self._bars.get(row)
+        # the reference is already dead, if the bar is closed by garbage collection of a cycle.
+        if ref is None or ref() is not bar and ref() is not None:
+            return
+        del self._bars[row]
+        for following in range(row + 1, self._end):
+            ref = self._bars.get(following)
+            moved = ref() if ref is not None else None
+            if moved is not None and moved.pos > 0:
+                # fixed bars keep their row, the next automatic bar skips it.
+                del self._bars[following]
+                self._bars[row] = ref
+                moved.pos = row
+                row = following
+        if row == self._end - 1:
+            self._end = row
+            while self._end and self._end - 1 not in self._bars:
+                self._end -= 1
+        else:
+            heappush(self._free, row)
+
+    def __len__(self):
+        return len(self._bars)
+
+
+def _render_all(bars):
+    cur_t = None
+    writers = []
+    try:
+        for bar in tuple(bars):
+            if bar.n != bar.last_print_n:
+                if cur_t is None:
+                    cur_t = bar._time()
+                if not any(writer is bar.fp for writer in writers):
+                    bar.fp.begin()
+                    writers.append(bar.fp)
+                bar._render(cur_t)
+    finally:
+        for writer in writers:
+            writer.end()
+
+
+class my_tqdm(CompiledMeterMixin, tqdm):
+    """ tqdm progress bar used by ProgressReporter for plain text output.
+
+    Parameters
+    ----------
+    background : bool or renderer, default=False
+        If True, updates only increment the counter of the bar, drawing is done
+        by a background thread shared by all bars (see _Renderer). Alternatively
+        the renderer owning the bar can be passed (e.g. a _LoopRenderer).
+    diff : bool, default=False
+        If True, only the changed part of the line is written to terminals (see _DiffPrinter).
+        Other output to the terminal garbles the line until the next frame written as a whole,
+        so this is only suitable if nothing else writes to the terminal (or uses tqdm.write).
+
+    The meter is drawn by the CompiledMeter of the bar_format (see _format.py). Files receive
+    the whole line on every redraw, unless diff is set. All output of a redraw is written at once (see _FrameWriter).
+    Bars which did not redraw for maxinterval seconds are refreshed by a deadline scheduled monitor
+    (see _monitor.py) instead of the polling monitor thread of tqdm.
+    """
+    monitor_interval = 0
+
+    def __new__(cls, *args, **kwargs):
+        if '_positions' not in cls.__dict__:
+            cls._positions = _PositionAllocator()
+        return super(my_tqdm, cls).__new__(cls, *args, **kwargs)
+
+    def __init__(self, *args, **kwargs):
+        background = kwargs.pop('background', False)
+        self.background = bool(background)
+        self._diff = kwargs.pop('diff', False)
+        self._renderer = None
+        self._terminal = False
+        self._monitored = False
+        kwargs['file'] = _FrameWriter.of(kwargs.get('file') or sys.stderr)
+        super(my_tqdm, self).__init__(*args, **kwargs)
+        if kwargs.get('position') is not None and not self.disable:
+            with self._lock:
+                self._positions.claim(abs(self.pos), self)
+        if background and not self.disable:
+            if background is True:
+                self._renderer = _Renderer.add_shared(self)
+            else:
+                self._renderer = background
+                background.add(self)
+        elif not self.disable:
+            self._watch()
+
+    @classmethod
+    def _get_free_pos(cls, instance=None):
+        # called by tqdm to position a new bar, disabled bars do not occupy a row.
+        if getattr(instance, 'disable', False):
+            return cls._positions.peek()
+        return cls._positions.acquire(instance)
+
+    @classmethod
+    def _decr_instances(cls, instance):
+        with cls._lock:
+            cls._instances.discard(instance)
+            if not instance.gui:
+                cls._positions.release(instance)
+
+    def status_printer(self, file):
+        self._terminal = _is_terminal(file)
+        if self._terminal and self._diff:
+            return _DiffPrinter(file, self)
+        return tqdm.status_printer(file)
+
+    def moveto(self, n):
+        if n < -1 and self._terminal:
+            # a single escape sequence moving the cursor up by n lines.
+            self.fp.write('\x1b[{}A'.format(-n))
+            self.fp.flush()
+        else:
+            super(my_tqdm, self).moveto(n)
+
+    def update(self, n=1):
+        if self.background:
+            # counting only, drawing is done by the renderer.
+            self.n += n
+        elif (self.disable or self.n + n - self.last_print_n < self.miniters
+              or self._time() - self.last_print_t < self.mininterval):
+            # not redrawing, so there is no frame to compose.
+            super(my_tqdm, self).update(n)
+        else:
+            self.fp.begin()
+            try:
+                super(my_tqdm, self).update(n)
+            finally:
+                self.fp.end()
+            self._watch()
+
+    def _watch(self):
+        # bars drawn in background are redrawn by their renderer.
+        if self.miniters > 1 and self.maxinterval and not self._monitored:
+            _monitor.monitor().watch(self)
+
+    def refresh(self, nolock=False):
+        if self.disable:
+            return
+        self.fp.begin()
+        try:
+            super(my_tqdm, self).refresh(nolock=nolock)
+        finally:
+            self.fp.end()
+
+    def _render(self, cur_t):
+        # draws the current state, caller has to hold the lock (if needed).
+        delta_t = cur_t - self.last_print_t
+        delta_it = self.n - self.last_print_n
+        if self.smoothing and delta_t and delta_it:
+            self.avg_time = self.ema(delta_t / delta_it, self.avg_time, self.smoothing)
+        if self.pos:
+            self.moveto(abs(self.pos))
+        self.sp(self.__repr__())
+        if self.pos:
+            self.moveto(-abs(self.pos))
+        self.last_print_n = self.n
+        self.last_print_t = cur_t
+
+    def close(self):
+        renderer = getattr(self, '_renderer', None)
+        if renderer is not None:
+            self._renderer = None
+            renderer.discard(self)
+        if getattr(self, '_monitored', False):
+            _monitor.monitor().unwatch(self)
+        if self.disable or getattr(self.fp, 'closed', False):
+            # nothing to draw, tqdm only releases the bar.
+            return super(my_tqdm, self).close()
+        self.fp.begin()
+        try:
+            super(my_tqdm, self).close()
+        finally:
+            self.fp.end()
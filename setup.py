@@ -1,3 +1,5 @@
+import os
+
 from setuptools import setup, find_packages
 import versioneer
 
@@ -10,23 +12,54 @@ License :: OSI Approved :: MIT License
 Natural Language :: English
 Operating System :: POSIX
 Operating System :: Microsoft :: Windows
-Programming Language :: Python :: 2.7
 Programming Language :: Python :: 3
+Programming Language :: Python :: 3 :: Only
 Topic :: Software Development :: User Interfaces
 Topic :: Software Development :: Widget Sets
 Topic :: Utilities"""
 
+
+
+def get_cmdclass():
+    """ the commands of versioneer, which also write the version as a plain string to _static_version.py
+
+    Importing progress_reporter reads __version__ from there, because the _version.py of versioneer
+    invokes git in development checkouts.
+    """
+    cmds = versioneer.get_cmdclass()
+
+    def write_static_version(base_dir, version):
+        with open(os.path.join(base_dir, 'progress_reporter', '_static_version.py'), 'w') as f:
+            f.write('# This file is generated by setup.py, do not edit.\n__version__ = {!r}\n'.format(version))
+
+    if 'build_py' in cmds:
+        class cmd_build_py(cmds['build_py']):
+            def run(self):
+                super(cmd_build_py, self).run()
+                write_static_version(self.build_lib, self.distribution.metadata.version)
+        cmds['build_py'] = cmd_build_py
+
+    class cmd_sdist(cmds['sdist']):
+        def make_release_tree(self, base_dir, files):
+            super(cmd_sdist, self).make_release_tree(base_dir, files)
+            write_static_version(base_dir, self.distribution.metadata.version)
+    cmds['sdist'] = cmd_sdist
+    return cmds
+
+
 with open('README.rst') as f:
     long_description = f.read()
 
 kw = dict(name='progress-reporter',
           long_description=long_description,
           version=versioneer.get_version(),
-          cmdclass=versioneer.get_cmdclass(),
+          cmdclass=get_cmdclass(),
           classifiers=[c for c in CLASSIFIERS.split('\n')],
           # version >= 2.0 includes tqdm-4.28.1 for sake of silence
           #install_requires=['tqdm>=4.23'],
           packages=find_packages(),
+          # str.isascii (terminal), module __getattr__ (PEP 562), asyncio.get_running_loop (aio)
+          python_requires='>=3.7',
           package_data={'progress_reporter.tests': ['*.ipynb']},
           url='https://github.com/marscher/progress_reporter',
           keywords=['progress', 'reporting', 'eta', 'gui'],
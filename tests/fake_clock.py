@@ -0,0 +1,18 @@
+""" Clock for tests of bars, which measure rates and elapsed time. """
+
+
+class Clock(object):
+    """ returns the time t, which tests advance by hand. """
+
+    def __init__(self, t=100.):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+def use_clock(bar, t=100.):
+    """ lets the bar take the time from a new Clock started at t and returns the clock. """
+    clock = bar._time = Clock(t)
+    bar.start_t = bar.last_print_t = clock.t
+    return clock
@@ -0,0 +1,72 @@
+from __future__ import absolute_import
+
+import asyncio
+import unittest
+from io import StringIO
+
+from progress_reporter.aio import AsyncProgressReporter_, _loop_renderers
+
+
+async def _numbers(n):
+    for i in range(n):
+        await asyncio.sleep(0)
+        yield i
+
+
+class TestAsyncProgressReporter(unittest.TestCase):
+
+    def test_aiterate(self):
+        out = StringIO()
+
+        async def main():
+            pg = AsyncProgressReporter_()
+            items = [i async for i in pg.aiterate(_numbers(20), amount_of_work=20, description='numbers',
+                                                  tqdm_args={'file': out})]
+            self.assertEqual(pg.num_registered, 0)
+            return items
+
+        self.assertEqual(asyncio.run(main()), list(range(20)))
+        self.assertIn('20/20', out.getvalue())
+
+    def test_context_and_loop_rendering(self):
+        out = StringIO()
+
+        async def main():
+            pg = AsyncProgressReporter_()
+            async with pg.context():
+                pg.register(10, tqdm_args={'file': out})
+                bar = pg._prog_rep_progressbars[0]
+                renderer = _loop_renderers[asyncio.get_running_loop()]
+                self.assertIn(bar, renderer.bars)
+                initial = out.getvalue()
+                async for _ in pg.aiterate(_numbers(4)):
+                    pass
+                # updates only count, drawing happens in the scheduled loop callback.
+                self.assertEqual(out.getvalue(), initial)
+                await asyncio.sleep(3 * renderer.interval)
+                self.assertIn('4/10', out.getvalue())
+            self.assertEqual(pg.num_registered, 0)
+            self.assertFalse(renderer.bars)
+
+        asyncio.run(main())
+
+    def test_as_completed(self):
+        out = StringIO()
+
+        async def square(x):
+            await asyncio.sleep(0.001 * (5 - x))
+            return x * x
+
+        async def main():
+            pg = AsyncProgressReporter_()
+            results = [r async for r in pg.as_completed([square(x) for x in range(5)], stage='squares',
+                                                        tqdm_args={'file': out})]
+            self.assertEqual(pg.num_registered, 0)
+            return results
+
+        self.assertEqual(sorted(asyncio.run(main())), [0, 1, 4, 9, 16])
+        self.assertIn('5/5', out.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+from __future__ import absolute_import
+
+import random
+import unittest
+from io import StringIO
+
+from progress_reporter import ProgressReporter_
+from progress_reporter.estimators import EMA, MedianOfWindows, WindowedRegression, read_traces, score
+from progress_reporter.jsonl import JSONLinesOutput
+
+from fake_clock import use_clock
+
+ESTIMATORS = (EMA, WindowedRegression, MedianOfWindows)
+
+
+def constant_trace(rate=50., dt=0.5, total=1000, t0=1e9):
+    return [(t0 + i * dt, min(total, int(rate * i * dt))) for i in range(int(total / rate / dt) + 1)]
+
+
+def bursty_trace(seed=0, total=2000):
+    # 20 items per second on average, but every tenth interval stalls for ten times as long.
+    rnd = random.Random(seed)
+    t, n, trace = 0., 0, [(0., 0)]
+    while n < total:
+        n = min(total, n + 10)
+        t += 5. if rnd.random() < 0.1 else 0.5 * rnd.uniform(0.9, 1.1)
+        trace.append((t, n))
+    return trace
+
+
+class TestEstimators(unittest.TestCase):
+
+    def test_constant_rate(self):
+        for cls in ESTIMATORS:
+            estimator = cls()
+            self.assertIsNone(estimator.rate())
+            for t, n in constant_trace():
+                estimator.update(n, t)
+            self.assertAlmostEqual(estimator.rate(), 50., places=5, msg=cls.__name__)
+
+    def test_repeated_observations_are_ignored(self):
+        for cls in ESTIMATORS:
+            estimator = cls()
+            for t, n in constant_trace(total=100):
+                estimator.update(n, t)
+                estimator.update(n, t)
+            self.assertAlmostEqual(estimator.rate(), 50., places=5, msg=cls.__name__)
+
+    def test_regression_window(self):
+        estimator = WindowedRegression(window=4)
+        buffers = estimator._t, estimator._n
+        for t, n in constant_trace(rate=10., total=100) + [(1e9 + 10 + i, 100 + 100 * i) for i in range(1, 5)]:
+            estimator.update(n, t)
+        # only the last four observations (rate 100) are fitted, in the same buffers.
+        self.assertAlmostEqual(estimator.rate(), 100.)
+        self.assertIs(estimator._t, buffers[0])
+        self.assertIs(estimator._n, buffers[1])
+
+    def test_median_ignores_stalls(self):
+        estimator = MedianOfWindows(window=5)
+        for t, n in [(0, 0), (1, 10), (2, 20), (12, 30), (13, 40), (14, 50)]:
+            estimator.update(n, t)
+        self.assertEqual(estimator.rate(), 10.)
+
+    def test_score(self):
+        traces = [bursty_trace(seed) for seed in range(5)]
+        scores = {cls.__name__: score(cls, traces) for cls in ESTIMATORS}
+        for name, result in scores.items():
+            self.assertGreater(result['coverage'], 0.99, name)
+            self.assertLess(result['median'], 0.6, name)
+        self.assertAlmostEqual(score(EMA, [constant_trace()])['mean'], 0.)
+
+    def test_estimator_of_stage(self):
+        out = StringIO()
+        pg = ProgressReporter_()
+        pg.output = JSONLinesOutput(out, interval=0)
+        estimator = MedianOfWindows()
+        pg.register(100, stage='s', estimator=estimator)
+        bar = pg._prog_rep_progressbars['s']
+        self.assertIs(bar.estimator, estimator)
+        clock = use_clock(bar)
+        # observations of the real clock would be in the future of the test clock.
+        bar.estimator = estimator = MedianOfWindows()
+        estimator.update(0, clock.t)
+        for _ in range(100):
+            clock.t += 1
+            pg.update(1, stage='s')
+        pg.finish(stage='s')
+        self.assertAlmostEqual(estimator.rate(), 1.)
+        # the events of the stage are a trace, the estimator observed the same.
+        trace, = read_traces(out.getvalue().splitlines())
+        self.assertEqual(trace[-1][1], 100)
+        self.assertEqual(len(trace), 102)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+from unittest import mock
+
+from progress_reporter import ProgressReporter_, set_history
+from progress_reporter.estimators import WindowedRegression
+from progress_reporter.history import History
+
+from fake_clock import use_clock
+
+
+class TestHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'history.jsonl')
+
+    def tearDown(self):
+        set_history(None)
+        shutil.rmtree(self.directory)
+
+    def run_stage(self, rate, amount_of_work=100, done=None, estimator=None):
+        pg = ProgressReporter_()
+        pg.register(amount_of_work, description='fit', stage='s', tqdm_args={'file': StringIO()},
+                    estimator=estimator)
+        bar = pg._prog_rep_progressbars['s']
+        seeded = bar._rate()
+        clock = use_clock(bar)
+        done = amount_of_work if done is None else done
+        clock.t += done / rate
+        pg.update(done, stage='s')
+        pg.finish(stage='s')
+        return seeded
+
+    def test_seed_from_earlier_runs(self):
+        set_history(self.path)
+        self.assertIsNone(self.run_stage(rate=20.))
+        self.assertAlmostEqual(self.run_stage(rate=40.), 20.)
+        # same description and stage, amount of work does not matter.
+        self.assertAlmostEqual(self.run_stage(rate=40., amount_of_work=1000), 30.)
+        # other processes read the history from the file.
+        set_history(self.path)
+        self.assertAlmostEqual(self.run_stage(rate=40., estimator=WindowedRegression()), 35.)
+
+    def test_incomplete_runs_are_not_recorded(self):
+        set_history(self.path)
+        self.run_stage(rate=20., done=50)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertIsNone(self.run_stage(rate=20.))
+
+    def test_lookups_are_cached(self):
+        history = History(self.path)
+        key = History.key(ProgressReporter_(), 's', 'fit')
+        history.record(key, 10.)
+        with mock.patch('progress_reporter.history.open', create=True) as open_:
+            for _ in range(10):
+                self.assertEqual(history.rate(key), 10.)
+            self.assertEqual(History(self.path).rate(('other', '0', '')), None)
+        self.assertEqual(open_.call_count, 1)
+
+    def test_compaction(self):
+        history = History(self.path, smoothing=1.)
+        key = History.key(ProgressReporter_(), 's', 'fit')
+        for i in range(1, 201):
+            history.record(key, float(i))
+        with open(self.path, 'a') as f:
+            f.write('{"key": ["truncated')
+        self.assertEqual(History(self.path, smoothing=1.).rate(key), 200.)
+        with open(self.path) as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+from __future__ import absolute_import
+
+import json
+import unittest
+from io import StringIO
+
+import progress_reporter.reporter as reporter
+from progress_reporter import ProgressReporter, ProgressReporter_, set_output
+from progress_reporter.jsonl import JSONLinesOutput
+
+from fake_clock import use_clock
+
+
+class TestJSONLinesOutput(unittest.TestCase):
+
+    def setUp(self):
+        self.out = StringIO()
+        self.output = JSONLinesOutput(self.out, interval=1.)
+
+    def tearDown(self):
+        set_output(None)
+
+    def events(self):
+        return [json.loads(line) for line in self.out.getvalue().splitlines()]
+
+    def test_events(self):
+        pg = ProgressReporter_()
+        pg.output = self.output
+        pg.register(100, description='work', stage='fit')
+        bar = pg._prog_rep_progressbars['fit']
+        clock = use_clock(bar)
+        for i in range(1, 11):
+            clock.t += 0.5
+            pg.update(1, stage='fit')
+        pg.finish(stage='fit')
+        events = self.events()
+        # finishing refreshes the bar, which samples the final state.
+        self.assertEqual([e['event'] for e in events], ['register'] + ['sample'] * 6 + ['finish'])
+        self.assertEqual(events[0], {'event': 'register', 'stage': 'fit', 'desc': 'work', 'n': 0,
+                                     'total': 100, 'rate': None, 'elapsed': 0.})
+        self.assertEqual([e['n'] for e in events[1:-1]], [2, 4, 6, 8, 10, 100])
+        self.assertEqual(events[-1]['n'], 100)
+        self.assertAlmostEqual(events[-1]['elapsed'], 5.)
+        self.assertAlmostEqual(events[-1]['rate'], 20.)
+        # finishing without a description keeps the last one.
+        self.assertEqual({e['desc'] for e in events}, {'work'})
+        # samples do not build the text meter.
+        self.assertIsNone(bar._meter)
+
+    def test_finish_description(self):
+        pg = ProgressReporter_()
+        pg.output = self.output
+        pg.register(10, description='work')
+        pg.update(5)
+        pg.finish(description='done')
+        self.assertEqual(self.events()[-1]['desc'], 'done')
+
+    def test_no_drawing(self):
+        pg = ProgressReporter_()
+        pg.output = self.output
+        pg.register(10, tqdm_args={'file': StringIO()})
+        pg.update(5)
+        pg.set_description('renamed')
+        pg.finish()
+        for line in self.out.getvalue().splitlines(True):
+            self.assertNotIn('\r', line)
+            self.assertTrue(line.endswith('}\n'))
+        self.assertEqual(self.events()[-1]['event'], 'finish')
+
+    def test_global_output(self):
+        set_output(self.output)
+        worker = ProgressReporter()
+        worker._progress_register(10, description='global')
+        worker._progress_update(10)
+        worker._progress_force_finish()
+        self.assertEqual([e['event'] for e in self.events()], ['register', 'sample', 'finish'])
+        # the output of a reporter takes precedence over the global one.
+        own = StringIO()
+        worker._progress_output = JSONLinesOutput(own)
+        worker._progress_register(10)
+        worker._progress_force_finish()
+        self.assertEqual(len(own.getvalue().splitlines()), 3)
+        self.assertEqual(len(self.events()), 3)
+
+    def test_output_by_name(self):
+        set_output('jsonl')
+        self.assertIsInstance(reporter._output, JSONLinesOutput)
+        with self.assertRaises(ValueError):
+            set_output('xml')
+
+
+if __name__ == '__main__':
+    unittest.main()
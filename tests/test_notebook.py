@@ -0,0 +1,171 @@
+from __future__ import absolute_import
+
+import contextlib
+import itertools
+import unittest
+
+from progress_reporter._format import compile_meter
+from progress_reporter._vendor.tqdm import tqdm
+from progress_reporter.notebook import _STATUS_FORMAT, _CommThrottle, _WidgetPrinter
+
+from fake_clock import Clock
+
+
+class Widget(object):
+    """ records the messages sent to the frontend, every assignment to a trait outside of hold_sync is one. """
+    bar_style = ''
+
+    def __init__(self):
+        object.__setattr__(self, 'messages', [])
+        object.__setattr__(self, '_held', None)
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if self._held is not None:
+            self._held[name] = value
+        else:
+            self.messages.append({name: value})
+
+    @contextlib.contextmanager
+    def hold_sync(self):
+        object.__setattr__(self, '_held', {})
+        try:
+            yield
+        finally:
+            if self._held:
+                self.messages.append(self._held)
+            object.__setattr__(self, '_held', None)
+
+
+class Bar(object):
+    n = 0
+
+
+class Timer(object):
+    """ records timers instead of starting threads, tests fire them by calling them. """
+
+    def __init__(self, interval, function):
+        self.interval = interval
+        self.function = function
+        self.started = False
+
+    def start(self):
+        self.started = True
+
+    def __call__(self):
+        self.function()
+
+
+class TestWidgetPrinter(unittest.TestCase):
+
+    def setUp(self):
+        self.bar = Bar()
+        self.pbar, self.ptext, self.container, self.description = Widget(), Widget(), Widget(), Widget()
+        self.clock = Clock(0.)
+        self.timers = []
+
+        def timer(interval, function):
+            self.timers.append(Timer(interval, function))
+            return self.timers[-1]
+
+        self.throttle = _CommThrottle(max_rate=10, burst=4, time=self.clock, timer=timer)
+        self.printer = _WidgetPrinter(self.bar, 10, self.pbar, self.ptext, self.container, self.description,
+                                      throttle=self.throttle)
+
+    def test_value_from_bar(self):
+        self.bar.n = 3
+        self.printer(' 30% 3/10 [00:01<00:02, 3.00it/s]')
+        self.assertEqual(self.pbar.value, 3)
+        self.assertEqual(self.ptext.value, ' 30% 3/10 [00:01&lt;00:02, 3.00it/s]')
+        # beyond the total, the value is not changed.
+        self.bar.n = 11
+        self.printer('11it [00:04, 2.75it/s]')
+        self.assertEqual(self.pbar.value, 3)
+
+    def test_unchanged_values_are_not_sent(self):
+        self.bar.n = 3
+        self.printer('status')
+        self.printer('status')
+        self.bar.n = 4
+        self.printer('status')
+        self.assertEqual(self.pbar.messages, [{'value': 3}, {'value': 4}])
+        self.assertEqual(self.ptext.messages, [{'value': 'status'}])
+
+    def test_style_and_description(self):
+        self.printer(bar_style='danger')
+        self.printer(bar_style='success')
+        self.assertEqual(self.pbar.bar_style, 'danger')
+        self.printer(desc='new')
+        self.assertEqual(self.description.value, 'new')
+        self.assertEqual(self.ptext.messages, [])
+
+    def test_rate_is_capped(self):
+        # 4 messages at once, then 10 messages per second.
+        for n in range(1, 11):
+            self.bar.n = n
+            self.printer('%d/10' % n)
+        self.assertEqual(len(self.pbar.messages) + len(self.ptext.messages), 4)
+        self.clock.t += 0.2
+        self.bar.n = 10
+        self.printer('10/10 done')
+        # the pending changes are coalesced: only the latest state is sent.
+        self.assertEqual(self.pbar.messages[-1], {'value': 10})
+        self.assertEqual(self.ptext.messages[-1], {'value': '10/10 done'})
+        self.assertEqual(len(self.pbar.messages) + len(self.ptext.messages), 6)
+
+    def test_pending_changes_are_flushed_by_timer(self):
+        for n in range(1, 6):
+            self.bar.n = n
+            self.printer('%d/10' % n)
+        self.assertEqual(self.pbar.messages[-1], {'value': 2})
+        # the bar stalls, a single timer fires once a token is refilled.
+        self.assertEqual(len(self.timers), 1)
+        self.assertTrue(self.timers[0].started)
+        self.assertAlmostEqual(self.timers[0].interval, 0.1)
+        self.clock.t += 0.1
+        self.timers[0]()
+        self.assertEqual(self.pbar.messages[-1], {'value': 5})
+        self.assertEqual(self.ptext.messages[-1], {'value': '5/10'})
+        # nothing is pending anymore, so no timer is started again.
+        self.assertEqual(len(self.timers), 1)
+
+    def test_rate_is_shared_by_all_printers(self):
+        bars = [self.bar, Bar(), Bar(), Bar()]
+        others = [_WidgetPrinter(bar, 10, Widget(), Widget(), Widget(), throttle=self.throttle) for bar in bars[1:]]
+        for n in range(1, 6):
+            for bar, printer in zip(bars, [self.printer] + others):
+                bar.n = n
+                printer('%d/10' % n)
+        sent = sum(len(p.pbar.messages) + len(p.ptext.messages) for p in [self.printer] + others)
+        self.assertEqual(sent, 4)
+        # the printers, which did not get budget, are flushed first, when there is budget again.
+        self.clock.t += 0.4
+        self.printer('5/10 again')
+        self.assertEqual([len(p.pbar.messages) for p in others], [1, 1, 1])
+
+    def test_final_state_is_always_sent(self):
+        for n in range(1, 11):
+            self.bar.n = n
+            self.printer('%d/10' % n)
+        self.printer(bar_style='success')
+        # value and style are sent in a single message.
+        self.assertEqual(self.pbar.messages[-1], {'value': 10, 'bar_style': 'success'})
+        self.assertEqual(self.ptext.messages[-1], {'value': '10/10'})
+
+
+class TestStatusFormat(unittest.TestCase):
+
+    def test_same_text_as_tqdm_notebook(self):
+        # tqdm_notebook formats '{n}/|/{l_bar}{r_bar}', parses n and removes the pipes.
+        for n, total, elapsed, rate, postfix in itertools.product(
+                (0, 5, 10, 11), (10, None), (0, 3), (None, 0.5, 200), (None, 'loss=1')):
+            text = tqdm.format_meter(n, total, elapsed, rate=rate, postfix=postfix, bar_format='{n}/|/{l_bar}{r_bar}')
+            npos = text.find('/|/')
+            if npos >= 0:
+                text = text[npos + 3:]
+            text = text.replace('||', '')
+            self.assertEqual(compile_meter(_STATUS_FORMAT)(n, total, elapsed, rate=rate, postfix=postfix), text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+from __future__ import absolute_import
+
+import multiprocessing
+import os
+import pickle
+import time
+import unittest
+from io import StringIO
+from unittest import mock
+
+from progress_reporter import ProgressReporter_
+
+
+def _work(args):
+    proxy, amount = args
+    for _ in range(amount):
+        proxy.update(1)
+    proxy.flush()
+    return amount
+
+
+def _count(args):
+    counter, amount = args
+    for _ in range(amount):
+        counter.update(1)
+    return amount
+
+
+# a counter inherited by forked processes instead of pickled to them.
+_inherited = None
+
+
+def _count_inherited(amount):
+    for _ in range(amount):
+        _inherited.update(1)
+    return amount
+
+
+def _wait_for(predicate, timeout=10):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+class TestWorkerProxy(unittest.TestCase):
+
+    def test_pool(self):
+        out = StringIO()
+        pg = ProgressReporter_()
+        pg.register(200, description='parallel', tqdm_args={'file': out})
+        bar = pg._prog_rep_progressbars[0]
+        proxy = pg.worker_proxy(batch_size=7)
+        pool = multiprocessing.Pool(2)
+        try:
+            with pg.context():
+                done = pool.map(_work, [(proxy, 20)] * 10)
+                self.assertEqual(sum(done), 200)
+                self.assertTrue(_wait_for(lambda: bar.n == 200))
+        finally:
+            pool.close()
+            pool.join()
+        self.assertEqual(pg.num_registered, 0)
+        self.assertIsNone(pg._prog_rep_listener)
+
+    def test_pickle_drops_pending(self):
+        pg = ProgressReporter_()
+        pg.register(100, tqdm_args={'file': StringIO()})
+        with pg.context():
+            proxy = pg.worker_proxy(batch_size=50)
+            proxy.update(3)
+            clone = pickle.loads(pickle.dumps(proxy))
+            self.assertEqual(clone._pending, 0)
+            self.assertEqual(clone.address, proxy.address)
+            self.assertEqual(clone.batch_size, 50)
+
+    def test_disabled(self):
+        pg = ProgressReporter_()
+        pg.show_progress = False
+        proxy = pg.worker_proxy()
+        proxy.update(1000)
+        self.assertIsNone(proxy.address)
+        self.assertIsNone(pg._prog_rep_listener)
+
+
+class TestSharedCounter(unittest.TestCase):
+
+    def test_threads(self):
+        from concurrent.futures import ThreadPoolExecutor
+        pg = ProgressReporter_()
+        pg.register(8000, tqdm_args={'file': StringIO()})
+        bar = pg._prog_rep_progressbars[0]
+        counter = pg.shared_counter()
+        self.assertIs(counter, pg.shared_counter())
+        with pg.context():
+            with ThreadPoolExecutor(8) as executor:
+                list(executor.map(_count, [(counter, 1000)] * 8))
+            self.assertEqual(counter.value, 8000)
+            self.assertTrue(_wait_for(lambda: bar.n == 8000))
+        self.assertIsNone(pg._prog_rep_sampler)
+        self.assertFalse(os.path.exists(counter.path))
+
+    def test_processes(self):
+        pg = ProgressReporter_()
+        pg.register(1000, tqdm_args={'file': StringIO()})
+        counter = pg.shared_counter()
+        pool = multiprocessing.Pool(3)
+        try:
+            pool.map(_count, [(counter, 100)] * 10)
+        finally:
+            pool.close()
+            pool.join()
+        self.assertEqual(counter.value, 1000)
+        # finishing takes a final sample
+        bar = pg._prog_rep_progressbars[0]
+        pg.finish()
+        self.assertEqual(bar.n, 1000)
+
+    @unittest.skipUnless('fork' in multiprocessing.get_all_start_methods(), 'requires fork')
+    def test_forked_processes(self):
+        global _inherited
+        pg = ProgressReporter_()
+        pg.register(400002, tqdm_args={'file': StringIO()})
+        counter = _inherited = pg.shared_counter()
+        self.addCleanup(globals().__setitem__, '_inherited', None)
+        # the slot claimed by this thread is not shared with the forked workers.
+        counter.update(1)
+        pool = multiprocessing.get_context('fork').Pool(4)
+        try:
+            pool.map(_count_inherited, [100000] * 4)
+        finally:
+            pool.close()
+            pool.join()
+        self.assertEqual(counter.value, 400001)
+        counter.update(1)
+        self.assertEqual(counter.value, 400002)
+        pg.finish()
+
+    def test_disabled(self):
+        pg = ProgressReporter_()
+        pg.show_progress = False
+        counter = pg.shared_counter()
+        counter.update(10)
+        self.assertIsNone(pg._prog_rep_sampler)
+
+
+class TestThreadSafeStage(unittest.TestCase):
+
+    def test_threads(self):
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+        calls = []
+        pg = ProgressReporter_()
+        ticker = pg.register(32000, tqdm_args={'file': StringIO()}, thread_safe=True)
+        pg.register_progress_callback(lambda stage, bar, **kw: calls.append(threading.current_thread()))
+        bar = pg._prog_rep_progressbars[0]
+
+        def work(i):
+            for _ in range(500):
+                pg.update(1)
+                ticker.update(1)
+
+        with ThreadPoolExecutor(32) as executor:
+            list(executor.map(work, range(32)))
+        # callbacks follow the update of the bar in the sampler thread.
+        self.assertTrue(_wait_for(lambda: bar.n == 32000 and calls))
+        # the bar is updated and callbacks are invoked by the sampler thread only.
+        self.assertNotIn(threading.main_thread(), calls)
+        self.assertEqual(len(set(calls)), 1)
+        pg.finish()
+        self.assertEqual(bar.n, 32000)
+        self.assertIsNone(pg._prog_rep_sampler)
+
+    def test_finish_merges_all_shards(self):
+        import threading
+        pg = ProgressReporter_()
+        pg.register(100, tqdm_args={'file': StringIO()}, thread_safe=True)
+        bar = pg._prog_rep_progressbars[0]
+        threads = [threading.Thread(target=pg.update, args=(10, )) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        with mock.patch.object(pg, '_progress_merge', wraps=pg._progress_merge) as merge:
+            pg.finish()
+        self.assertEqual(sum(call[0][0] for call in merge.call_args_list), 100)
+        self.assertEqual(bar.n, 100)
+        # registering the stage again, does not keep its counter.
+        pg.register(100, tqdm_args={'file': StringIO()})
+        pg.update(5)
+        self.assertEqual(pg._prog_rep_progressbars[0].n, 5)
+        pg.finish()
+
+
+if __name__ == '__main__':
+    unittest.main()
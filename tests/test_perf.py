@@ -0,0 +1,486 @@
+"""
+Benchmarks comparing the overhead of the different ways to report progress.
+
+The timings are printed (run pytest with ``-s`` to see them). Comparisons of timings depend on
+the load of the machine, so they are only run, if the environment variable
+**PROGRESS_REPORTER_BENCHMARKS=1** is set. Counts (calls, writes, bytes, imported modules) are
+always checked.
+"""
+from __future__ import absolute_import, print_function
+
+import os
+import unittest
+from time import thread_time
+
+benchmarks = os.environ.get('PROGRESS_REPORTER_BENCHMARKS', '0') not in ('', '0')
+benchmark = unittest.skipUnless(benchmarks, 'set PROGRESS_REPORTER_BENCHMARKS=1 to run benchmarks')
+
+from progress_reporter import ProgressReporter, ProgressReporterMixIn, set_show_progress
+
+
+class MockIO(object):
+    """ file-like object which discards everything written to it. """
+    encoding = 'utf-8'
+
+    def write(self, s):
+        pass
+
+    def flush(self):
+        pass
+
+
+class LegacyReporter(object):
+    """ stores its state like ProgressReporter did before, in lazily created attributes. """
+
+    @property
+    def show_progress(self):
+        if not hasattr(self, "_show_progress"):
+            self._show_progress = True
+        return self._show_progress
+
+    @show_progress.setter
+    def show_progress(self, val):
+        self._show_progress = bool(val)
+
+    @property
+    def _prog_rep_progressbars(self):
+        if not hasattr(self, '_LegacyReporter__prog_rep_progressbars'):
+            self.__prog_rep_progressbars = {}
+        return self.__prog_rep_progressbars
+
+    @property
+    def _prog_rep_callbacks(self):
+        if not hasattr(self, '_LegacyReporter__prog_rep_callbacks'):
+            self.__prog_rep_callbacks = {}
+        return self.__prog_rep_callbacks
+
+    def _progress_update(self, numerator_increment, stage=0):
+        # the attribute traffic of an update, without the work of the progress bar.
+        if not self.show_progress:
+            return
+        if stage not in self._prog_rep_progressbars:
+            raise RuntimeError()
+        pg = self._prog_rep_progressbars[stage]
+        if stage in self._prog_rep_callbacks:
+            pass
+        return pg
+
+
+class StateReporter(ProgressReporterMixIn):
+    __slots__ = ('_progress_state', )
+
+    def _progress_update(self, numerator_increment, stage=0):
+        # the attribute traffic of an update, without the work of the progress bar.
+        state = self._prog_rep_state
+        if not state.show_progress:
+            return
+        pg = state.progressbars[stage]
+        callbacks = state.callbacks
+        if callbacks and stage in callbacks:
+            pass
+        return pg
+
+
+class CountingIO(MockIO):
+    """ file-like object counting the bytes written to it. """
+
+    def __init__(self, tty=False):
+        self.bytes = 0
+        self.writes = 0
+        self.flushes = 0
+        self._tty = tty
+
+    def isatty(self):
+        return self._tty
+
+    def write(self, s):
+        self.bytes += len(s.encode(self.encoding))
+        self.writes += 1
+
+    def flush(self):
+        self.flushes += 1
+
+
+def memory_per_instance(factory, n=10000):
+    import gc
+    import tracemalloc
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        instances = [factory() for _ in range(n)]
+        used = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    del instances
+    return used / n
+
+
+def per_call_overhead(fn, n):
+    # CPU time of this thread only, background threads of other tests must not count.
+    start = thread_time()
+    fn(n)
+    return (thread_time() - start) / n
+
+
+class TestPerf(unittest.TestCase):
+    n = 200000
+
+    def _report(self, name, seconds):
+        print('{:<56s} {:8.1f} ns/call'.format(name, seconds * 1e9))
+
+    @benchmark
+    def test_ticker_vs_progress_update(self):
+        def update_loop(n):
+            worker = ProgressReporter()
+            worker._progress_register(n, tqdm_args={'file': MockIO()})
+            update = worker._progress_update
+            for _ in range(n):
+                update(1)
+            worker._progress_force_finish()
+
+        def ticker_loop(n):
+            worker = ProgressReporter()
+            ticker = worker._progress_register(n, tqdm_args={'file': MockIO()})
+            update = ticker.update
+            for _ in range(n):
+                update(1)
+            worker._progress_force_finish()
+
+        t_update = per_call_overhead(update_loop, self.n)
+        t_ticker = per_call_overhead(ticker_loop, self.n)
+        self._report('_progress_update', t_update)
+        self._report('ticker.update', t_ticker)
+        self.assertLess(t_ticker, t_update / 2)
+
+    @benchmark
+    def test_iterate(self):
+        from progress_reporter import ProgressReporter_
+
+        def callback(stage, pg, **kw):
+            pass
+
+        def update_loop(n):
+            worker = ProgressReporter_()
+            worker.register(n, tqdm_args={'file': MockIO()})
+            worker.register_progress_callback(callback)
+            update = worker.update
+            for _ in range(n):
+                update(1)
+            worker.finish()
+
+        def ticker_loop(n):
+            worker = ProgressReporter_()
+            ticker = worker.register(n, tqdm_args={'file': MockIO()})
+            worker.register_progress_callback(callback)
+            update = ticker.update
+            for _ in range(n):
+                update(1)
+            worker.finish()
+
+        def iterate_loop(n):
+            worker = ProgressReporter_()
+            items = worker.iterate(range(n), tqdm_args={'file': MockIO()})
+            worker.register_progress_callback(callback)
+            for _ in items:
+                pass
+
+        t_update = per_call_overhead(update_loop, self.n)
+        t_ticker = per_call_overhead(ticker_loop, self.n)
+        t_iterate = per_call_overhead(iterate_loop, self.n)
+        self._report('update, with callback', t_update)
+        self._report('ticker.update, with callback', t_ticker)
+        self._report('iterate, with callback', t_iterate)
+        self.assertLess(t_iterate, t_update / 4)
+
+    def test_batched_callbacks(self):
+        calls = [0]
+
+        def call_back(stage, pg, **kw):
+            calls[0] += 1
+
+        def loop(n, **batch):
+            worker = ProgressReporter()
+            worker._progress_register(n, tqdm_args={'file': MockIO()})
+            worker.register_progress_callback(call_back, **batch)
+            update = worker._progress_update
+            for _ in range(n):
+                update(1)
+            worker._progress_force_finish()
+
+        calls[0] = 0
+        t_immediate = per_call_overhead(loop, self.n)
+        self.assertEqual(calls[0], self.n)
+        calls[0] = 0
+        t_batched = per_call_overhead(lambda n: loop(n, batch_increments=1000), self.n)
+        # one call per batch plus the final flush on finish
+        self.assertEqual(calls[0], self.n // 1000 + 1)
+        self._report('_progress_update, immediate callback', t_immediate)
+        self._report('_progress_update, batched callback', t_batched)
+
+    @benchmark
+    def test_state_attribute_traffic(self):
+        def loop(reporter):
+            def run(n):
+                update = reporter._progress_update
+                for _ in range(n):
+                    update(1)
+            return run
+
+        legacy = LegacyReporter()
+        legacy._prog_rep_progressbars[0] = None
+        state = StateReporter()
+        state._prog_rep_progressbars[0] = None
+        t_legacy = per_call_overhead(loop(legacy), self.n)
+        t_state = per_call_overhead(loop(state), self.n)
+        self._report('state lookups, hasattr properties', t_legacy)
+        self._report('state lookups, state object', t_state)
+        self.assertLess(t_state, t_legacy)
+
+    def test_state_memory(self):
+        def factory(cls, show_progress=None):
+            def create():
+                reporter = cls()
+                if show_progress is None:
+                    assert reporter.show_progress
+                else:
+                    reporter.show_progress = show_progress
+                return reporter
+            return create
+
+        class Plain(object):
+            __slots__ = ()
+
+        plain = memory_per_instance(Plain)
+        for name, show_progress in (('show_progress queried', None), ('show_progress disabled', False)):
+            legacy = memory_per_instance(factory(LegacyReporter, show_progress))
+            state = memory_per_instance(factory(StateReporter, show_progress))
+            print('{:<56s} {:8.1f} bytes'.format('instance, hasattr properties, ' + name, legacy))
+            print('{:<56s} {:8.1f} bytes'.format('instance, state object, ' + name, state))
+            self.assertLess(state, legacy)
+        # a reporter, which has never been configured costs a single pointer.
+        self.assertLessEqual(memory_per_instance(StateReporter), plain + 8)
+
+    @benchmark
+    def test_disabled_overhead(self):
+        class Uninstrumented(object):
+            def _progress_update(self, numerator_increment, stage=0, show_eta=True, **kw):
+                pass
+
+        def loop(worker):
+            def run(n):
+                update = worker._progress_update
+                for _ in range(n):
+                    update(1)
+            return run
+
+        def ticker_loop(ticker):
+            def run(n):
+                update = ticker.update
+                for _ in range(n):
+                    update(1)
+            return run
+
+        hidden = ProgressReporter()
+        hidden.show_progress = False
+        t_noop = min(per_call_overhead(loop(Uninstrumented()), self.n) for _ in range(3))
+        t_hidden = min(per_call_overhead(loop(hidden), self.n) for _ in range(3))
+        t_ticker = min(per_call_overhead(ticker_loop(hidden._progress_register(self.n)), self.n)
+                       for _ in range(3))
+        set_show_progress(False)
+        try:
+            t_global = min(per_call_overhead(loop(ProgressReporter()), self.n) for _ in range(3))
+        finally:
+            set_show_progress(True)
+        self._report('no-op method call', t_noop)
+        self._report('_progress_update, hidden instance', t_hidden)
+        self._report('_progress_update, hidden globally', t_global)
+        self._report('ticker.update, hidden instance', t_ticker)
+        # a hidden update costs about one function call.
+        self.assertLess(t_hidden, 2 * t_noop)
+        self.assertLess(t_global, 2 * t_noop)
+        self.assertLess(t_ticker, 2 * t_noop)
+
+    @benchmark
+    def test_render_throughput(self):
+        from timeit import repeat
+        from progress_reporter._format import compile_meter
+        from progress_reporter._vendor.tqdm import tqdm
+
+        formats = (None, '{n}/|/{l_bar}{r_bar}', '{l_bar}{bar}| {n_fmt}/{total_fmt}',
+                   '{desc}: {percentage:3.0f}%|{bar}| {rate_inv_fmt}')
+        n = 2000
+        t_format_meter = t_compiled = 0
+        for bar_format in formats:
+            meter = compile_meter(bar_format)
+            for ncols in (40, 80, 160):
+                args = (500, 1000, 12.5, ncols, 'stage', False, 'it', False, None)
+                expected = tqdm.format_meter(*(args + (bar_format, None, 1000)))
+                self.assertEqual(meter(*(args + (None, 1000))), expected)
+                t_original = min(repeat(lambda: tqdm.format_meter(*(args + (bar_format, None, 1000))),
+                                        number=n, repeat=3)) / n
+                t_meter = min(repeat(lambda: meter(*(args + (None, 1000))), number=n, repeat=3)) / n
+                name = '{}, ncols={}'.format(bar_format, ncols)
+                self._report('format_meter ' + name, t_original)
+                self._report('compiled ' + name, t_meter)
+                t_format_meter += t_original
+                t_compiled += t_meter
+        self.assertLess(t_compiled, t_format_meter)
+
+    def test_output_bytes(self):
+        class DiffReporter(ProgressReporter):
+            _pg_diff_rendering = True
+
+        def run(out, stages=3, n=1000, reporter=ProgressReporter):
+            worker = reporter()
+            for stage in range(stages):
+                worker._progress_register(n, description='stage {}'.format(stage), stage=stage,
+                                          tqdm_args={'file': out, 'mininterval': 0, 'miniters': 1, 'ncols': 100})
+            start = out.bytes
+            for _ in range(n):
+                for stage in range(stages):
+                    worker._progress_update(1, stage=stage)
+            redraws = n * stages
+            per_redraw = (out.bytes - start) / redraws
+            for stage in range(stages):
+                worker._progress_force_finish(stage)
+            return per_redraw
+
+        full = run(CountingIO(tty=False))
+        diff = run(CountingIO(tty=True), reporter=DiffReporter)
+        # at the default refresh rate of tqdm (mininterval=0.1s)
+        print('{:<56s} {:8.1f} bytes/s'.format('3 stages, whole lines', 3 * 10 * full))
+        print('{:<56s} {:8.1f} bytes/s'.format('3 stages, changed columns', 3 * 10 * diff))
+        self.assertLess(diff, full / 2)
+
+    def test_frame_syscalls(self):
+        from progress_reporter._vendor.tqdm import tqdm
+        from progress_reporter.terminal import _Renderer, my_tqdm
+        stages = 6
+
+        # plain tqdm: every bar moves to its line, draws and moves back, each with write and flush.
+        out = CountingIO()
+        bars = [tqdm(total=100, position=i, file=out, mininterval=0, miniters=1) for i in range(stages)]
+        start = out.writes + out.flushes
+        for bar in bars:
+            bar.update(1)
+        per_frame_tqdm = out.writes + out.flushes - start
+        for bar in reversed(bars):
+            bar.close()
+
+        out = CountingIO()
+        interval = _Renderer.interval
+        _Renderer.interval = 3600
+        self.addCleanup(setattr, _Renderer, 'interval', interval)
+        bars = [my_tqdm(total=100, position=i, file=out, background=True) for i in range(stages)]
+        for bar in bars:
+            bar.update(1)
+        start = out.writes + out.flushes
+        _Renderer.shared().render()
+        per_frame = out.writes + out.flushes - start
+        for bar in reversed(bars):
+            bar.close()
+        print('{:<56s} {:8d} calls'.format('write/flush per frame of 6 bars, tqdm', per_frame_tqdm))
+        print('{:<56s} {:8d} calls'.format('write/flush per frame of 6 bars, composed', per_frame))
+        self.assertEqual(per_frame, 2)
+
+    @benchmark
+    def test_register_finish_cycles(self):
+        from unittest import mock
+        from progress_reporter._vendor.tqdm import tqdm
+        from progress_reporter.terminal import my_tqdm
+
+        def cycles(n, active=200):
+            worker = ProgressReporter()
+            for stage in range(1, active + 1):
+                worker._progress_register(10, stage=stage, tqdm_args={'file': MockIO()})
+            start = thread_time()
+            for _ in range(n):
+                worker._progress_register(10, tqdm_args={'file': MockIO()})
+                worker._progress_force_finish()
+            elapsed = thread_time() - start
+            for stage in range(1, active + 1):
+                worker._progress_force_finish(stage)
+            return elapsed / n
+
+        n = 10000
+        t_allocator = cycles(n)
+        # position bars like tqdm, by scanning all bars.
+        with mock.patch.object(my_tqdm, '_get_free_pos', classmethod(tqdm._get_free_pos.__func__)), \
+                mock.patch.object(my_tqdm, '_decr_instances', classmethod(tqdm._decr_instances.__func__)):
+            t_scanning = cycles(n)
+        self._report('register/finish, 200 active stages, scanning', t_scanning)
+        self._report('register/finish, 200 active stages, allocator', t_allocator)
+        self.assertLess(t_allocator, t_scanning)
+
+    def test_thread_scaling(self):
+        import threading
+        from time import perf_counter
+
+        def run(threads, thread_safe, k=2000):
+            worker = ProgressReporter()
+            worker._progress_register(threads * k, tqdm_args={'file': MockIO()}, thread_safe=thread_safe)
+            update = worker._progress_update
+
+            def work():
+                for _ in range(k):
+                    update(1)
+            pool = [threading.Thread(target=work) for _ in range(threads)]
+            # wall time, the updates of all threads count.
+            start = perf_counter()
+            for t in pool:
+                t.start()
+            for t in pool:
+                t.join()
+            elapsed = perf_counter() - start
+            state = worker._prog_rep_state
+            counted = state.shards[0].value if thread_safe else state.progressbars[0].n
+            worker._progress_force_finish()
+            return elapsed / (threads * k), counted
+
+        for threads in (1, 8, 32, 64):
+            t_shared, _ = run(threads, False)
+            t_sharded, counted = run(threads, True)
+            self._report('_progress_update, {} threads, shared bar'.format(threads), t_shared)
+            self._report('_progress_update, {} threads, thread-safe stage'.format(threads), t_sharded)
+            self.assertEqual(counted, threads * 2000)
+            if benchmarks and threads >= 32:
+                self.assertLess(t_sharded, t_shared)
+
+    def test_import_time(self):
+        import os
+        import subprocess
+        import sys
+        import progress_reporter
+        root = os.path.dirname(os.path.dirname(os.path.abspath(progress_reporter.__file__)))
+
+        def import_times(statement):
+            # cumulative import time in microseconds per module, measured by python -X importtime
+            proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], cwd=root,
+                                  stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+            times = {}
+            for line in proc.stderr.splitlines():
+                if not line.startswith('import time:') or 'cumulative' in line:
+                    continue
+                _, cumulative, module = line[len('import time:'):].split('|')
+                times[module.strip()] = int(cumulative)
+            return times
+
+        times = min((import_times('import progress_reporter') for _ in range(3)),
+                    key=lambda t: t['progress_reporter'])
+        print('{:<56s} {:8.1f} ms'.format('import progress_reporter', times['progress_reporter'] * 1e-3))
+        for module in ('progress_reporter._version', 'progress_reporter._vendor.tqdm', 'subprocess',
+                       'contextlib', 'multiprocessing'):
+            self.assertNotIn(module, times)
+        if benchmarks:
+            self.assertLess(times['progress_reporter'], 50000)
+
+        # the rendering backend is loaded by the first visible bar only.
+        times = import_times('import progress_reporter; progress_reporter.ProgressReporter()._progress_register(2)')
+        self.assertNotIn('progress_reporter._vendor.tqdm', times)
+        times = import_times('import progress_reporter; progress_reporter.ProgressReporter()._progress_register(10)')
+        self.assertIn('progress_reporter._vendor.tqdm', times)
+
+
+if __name__ == '__main__':
+    unittest.main()
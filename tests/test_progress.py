@@ -6,7 +6,9 @@ Created on 29.07.2015
 
 from __future__ import absolute_import
 
+import os
 import unittest
+from unittest import mock
 from time import sleep
 import sys
 
@@ -15,7 +17,11 @@ if sys.version_info[0] == 3:
 else:
     from cStringIO import StringIO
 
-from progress_reporter import ProgressReporter, ProgressReporter_
+from progress_reporter import ProgressReporter, ProgressReporter_, ProgressReporterMixIn, set_show_progress
+
+
+class Pipeline(ProgressReporter_):
+    _pg_combined = True
 
 
 class TestProgress(unittest.TestCase):
@@ -39,6 +45,41 @@ class TestProgress(unittest.TestCase):
             worker._progress_update(1, stage=0)
         self.assertEqual(self.has_been_called, amount_of_work)
 
+    def test_batched_callback(self):
+        increments = []
+
+        def call_back(stage, progressbar, increment, elapsed, rate, **kw):
+            increments.append(increment)
+
+        amount_of_work = 10000
+        worker = ProgressReporter()
+        worker._progress_register(amount_of_work, tqdm_args={'file': self.out})
+        worker.register_progress_callback(call_back, batch_increments=1000)
+        for _ in range(amount_of_work - 1):
+            worker._progress_update(1)
+        self.assertEqual(len(increments), 9)
+        self.assertEqual(set(increments), {1000})
+        # finishing guarantees a final call with the remainder.
+        worker._progress_force_finish()
+        self.assertEqual(len(increments), 10)
+        self.assertEqual(sum(increments), amount_of_work)
+
+    def test_batched_callback_interval(self):
+        calls = []
+
+        def call_back(stage, progressbar, increment, elapsed, rate, **kw):
+            calls.append((increment, elapsed))
+
+        worker = ProgressReporter()
+        worker._progress_register(100, tqdm_args={'file': self.out, 'mininterval': 0})
+        worker.register_progress_callback(call_back, batch_interval=3600)
+        for _ in range(50):
+            worker._progress_update(1)
+        self.assertEqual(calls, [])
+        worker._progress_force_finish()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0][0], 100)
+
     def test_force_finish(self):
         import warnings
         worker = ProgressReporter()
@@ -57,6 +98,61 @@ class TestProgress(unittest.TestCase):
         worker._progress_update(5)
         self.assertEqual(self.out.getvalue().strip(), '')
 
+    def test_hide_globally(self):
+        set_show_progress(False)
+        self.addCleanup(set_show_progress, True)
+        worker = ProgressReporter()
+        self.assertFalse(worker.show_progress)
+        ticker = worker._progress_register(10, tqdm_args={'file': self.out})
+        ticker.update(5)
+        worker._progress_update(5)
+        worker._progress_force_finish()
+        self.assertEqual(self.out.getvalue(), '')
+        self.assertEqual(worker._progress_num_registered, 0)
+
+        set_show_progress(True)
+        self.assertTrue(worker.show_progress)
+
+    def test_notebook_mode(self):
+        from progress_reporter import reporter, set_notebook_mode
+        self.addCleanup(set_notebook_mode, None)
+        calls = []
+
+        def detect():
+            calls.append(1)
+            return False
+
+        original = reporter._detect_ipy_notebook_with_widgets
+        reporter._detect_ipy_notebook_with_widgets = detect
+        self.addCleanup(setattr, reporter, '_detect_ipy_notebook_with_widgets', original)
+
+        set_notebook_mode(None)
+        self.assertFalse(reporter._attached_to_ipy_notebook_with_widgets())
+        self.assertFalse(reporter._attached_to_ipy_notebook_with_widgets())
+        self.assertEqual(len(calls), 1)
+        set_notebook_mode(True)
+        self.assertTrue(reporter._attached_to_ipy_notebook_with_widgets())
+        # resetting the mode detects again
+        set_notebook_mode(None)
+        self.assertFalse(reporter._attached_to_ipy_notebook_with_widgets())
+        self.assertEqual(len(calls), 2)
+
+    def test_notebook_detection_imports_nothing(self):
+        import subprocess
+        code = ('import sys; from progress_reporter import ProgressReporter; '
+                'ProgressReporter()._progress_register(10, tqdm_args={"file": sys.stderr}); '
+                'print("IPython" in sys.modules, "ipywidgets" in sys.modules)')
+        import progress_reporter
+        root = os.path.dirname(os.path.dirname(os.path.abspath(progress_reporter.__file__)))
+        out = subprocess.check_output([sys.executable, '-c', code], cwd=root, stderr=subprocess.DEVNULL)
+        self.assertEqual(out.decode().split(), ['False', 'False'])
+
+    def test_version(self):
+        import progress_reporter
+        self.assertIsInstance(progress_reporter.__version__, str)
+        with self.assertRaises(AttributeError):
+            progress_reporter.no_such_attribute
+
     def test_show(self):
         worker = ProgressReporter()
         worker.show_progress = True
@@ -135,6 +231,110 @@ class TestProgress(unittest.TestCase):
         except Exception:
             assert pg.num_registered == 0
 
+    def test_ticker(self):
+        self.has_been_called = 0
+
+        def call_back(stage, progressbar, *args, **kw):
+            self.has_been_called += 1
+
+        worker = ProgressReporter()
+        ticker = worker._progress_register(1000, tqdm_args={'file': self.out, 'mininterval': 10})
+        worker.register_progress_callback(call_back)
+        for _ in range(1000):
+            ticker.update(1)
+        # increments are only handed over in batches
+        self.assertLess(self.has_been_called, 100)
+        worker._progress_force_finish()
+        self.assertEqual(ticker._pushed, 1000)
+        self.assertIn('1000/1000', self.out.getvalue())
+        # updating a finished ticker does nothing
+        ticker.update(1)
+
+    def test_ticker_stalled(self):
+        worker = ProgressReporter()
+        # miniters as left behind by a fast phase, the ticker holds the next 10**5 increments.
+        ticker = worker._progress_register(10**6, tqdm_args={'file': self.out, 'miniters': 10**5,
+                                                             'maxinterval': 0.05})
+        pg = worker._prog_rep_progressbars[0]
+        for _ in range(10):
+            ticker.update(1)
+        self.assertEqual(pg.n, 1)
+        # the loop stalls, the monitor refreshes the bar and wakes up the ticker.
+        for _ in range(100):
+            if pg.miniters == 1:
+                break
+            sleep(0.01)
+        self.assertEqual(pg.miniters, 1)
+        self.assertIn('1/1000000', self.out.getvalue())
+        ticker.update(1)
+        self.assertEqual(pg.n, 11)
+        worker._progress_force_finish()
+
+    def test_ticker_disabled(self):
+        worker = ProgressReporter()
+        worker.show_progress = False
+        ticker = worker._progress_register(100, tqdm_args={'file': self.out})
+        ticker.update(10)
+        ticker.flush()
+        self.assertEqual(self.out.getvalue(), '')
+
+    def test_slots(self):
+        class SlottedWorker(ProgressReporterMixIn):
+            __slots__ = ('n_jobs', '_progress_state')
+
+            def __init__(self, n_jobs):
+                self.n_jobs = n_jobs
+
+        worker = SlottedWorker(10)
+        self.assertFalse(hasattr(worker, '__dict__'))
+        self.assertTrue(worker.show_progress)
+        worker._progress_register(worker.n_jobs, tqdm_args={'file': self.out})
+        worker._progress_update(5)
+        worker._progress_force_finish()
+        self.assertIn('10/10', self.out.getvalue())
+        worker.show_progress = False
+        self.assertFalse(worker.show_progress)
+
+        class Undeclared(ProgressReporterMixIn):
+            __slots__ = ()
+
+        with self.assertRaises(TypeError):
+            Undeclared()._progress_register(10, tqdm_args={'file': self.out})
+
+    def test_instance_layouts(self):
+        class SlottedBase(object):
+            __slots__ = ('x', )
+
+        # neither the reporter nor the mixin conflict with the instance layout of other bases.
+        for base in (SlottedBase, dict, Exception):
+            for reporter in (ProgressReporter, ProgressReporterMixIn):
+                type('Host', (base, reporter), {})
+            worker = type('Host', (base, ProgressReporter), {})()
+            worker._progress_register(10, tqdm_args={'file': self.out})
+            worker._progress_update(10)
+            worker._progress_force_finish()
+        self.assertIn('10/10', self.out.getvalue())
+
+    def test_show_progress_toggle(self):
+        worker = ProgressReporter()
+        worker.show_progress = False
+        self.assertFalse(worker.show_progress)
+        worker._progress_register(10, tqdm_args={'file': self.out})
+        self.assertEqual(worker._progress_num_registered, 0)
+        worker.show_progress = True
+        self.assertTrue(worker.show_progress)
+        worker._progress_register(10, tqdm_args={'file': self.out})
+        self.assertEqual(worker._progress_num_registered, 1)
+        worker._progress_force_finish()
+
+    def test_state_created_lazily(self):
+        worker = ProgressReporter()
+        self.assertTrue(worker.show_progress)
+        self.assertFalse(hasattr(worker, '_progress_state'))
+        worker._progress_register(10, tqdm_args={'file': self.out})
+        self.assertTrue(hasattr(worker, '_progress_state'))
+        worker._progress_force_finish()
+
     def test_below_threshold(self):
         # show not raise
         pg = ProgressReporter_()
@@ -142,6 +342,164 @@ class TestProgress(unittest.TestCase):
         pg.update(1)
         pg.set_description('dummy')
 
+    def test_nested_stages(self):
+        fit, cluster, featurize = ProgressReporter_(), ProgressReporter_(), ProgressReporter_()
+        redraw = {'file': self.out, 'mininterval': 0}
+        fit_ticker = fit.register(10, description='fit', tqdm_args=redraw)
+        cluster_ticker = cluster.register(100, description='cluster', parent=fit_ticker, weight=6, tqdm_args=redraw)
+        featurize.register(1000, description='featurize', parent=cluster_ticker, weight=50, tqdm_args=redraw)
+        fit_bar = fit._prog_rep_progressbars[0]
+        cluster_bar = cluster._prog_rep_progressbars[0]
+        for _ in range(500):
+            featurize.update(1)
+        self.assertEqual(cluster_bar.n, 25)
+        self.assertEqual(fit_bar.n, 1)
+        featurize.finish()
+        self.assertEqual(cluster_bar.n, 50)
+        self.assertEqual(fit_bar.n, 3)
+        cluster.finish()
+        self.assertEqual(fit_bar.n, 6)
+        fit.finish()
+
+    def test_nested_stages_float_weight(self):
+        parent, child = ProgressReporter_(), ProgressReporter_()
+        ticker = parent.register(10, tqdm_args={'file': self.out})
+        parent_bar = parent._prog_rep_progressbars[0]
+        child.register(100, parent=ticker, weight=3.6, tqdm_args={'file': self.out, 'mininterval': 0})
+        child.update(50)
+        self.assertEqual(parent_bar.n, 2)
+        child.finish()
+        # the parent counts whole units.
+        self.assertEqual(parent_bar.n, 4)
+        self.assertIsInstance(parent_bar.n, int)
+        parent.finish()
+
+    def test_nested_stages_propagate_on_redraw(self):
+        parent, child = ProgressReporter_(), ProgressReporter_()
+        ticker = parent.register(10, tqdm_args={'file': self.out})
+        child.register(1000, parent=ticker, weight=4, tqdm_args={'file': self.out, 'mininterval': 100})
+        parent_bar = parent._prog_rep_progressbars[0]
+        with mock.patch.object(parent_bar, 'update', wraps=parent_bar.update) as update:
+            for _ in range(1000):
+                child.update(1)
+            # the child did not redraw, so the parent did not hear of it.
+            self.assertEqual(update.call_count, 0)
+            child.finish()
+            self.assertEqual(update.call_count, 1)
+        self.assertEqual(parent_bar.n, 4)
+        parent.finish()
+        # parents without bar are ignored.
+        ticker = parent.register(2)
+        child.register(10, parent=ticker, tqdm_args={'file': self.out})
+        child.finish()
+
+    def test_combined_stages(self):
+        pg = Pipeline()
+        redraw = {'file': self.out, 'mininterval': 0}
+        pg.register(100, description='load', stage='load', weight=1, tqdm_args=redraw)
+        pg.register(10, description='fit', stage='fit', weight=2, tqdm_args=dict(redraw))
+        pg.register(3, description='save', stage='save', weight=1, tqdm_args=dict(redraw))
+        bar = pg._prog_rep_state.combined.pg
+        self.assertEqual(bar.total, 4000)
+        pg.update(50, stage='load')
+        self.assertEqual((bar.n, bar.desc), (500, 'load'))
+        pg.update(5, stage='fit')
+        self.assertEqual((bar.n, bar.desc), (1500, 'fit'))
+        pg.finish(stage='load')
+        self.assertEqual(bar.n, 2000)
+        pg.finish(stage='fit')
+        self.assertFalse(bar.disable)
+        pg.finish(stage='save')
+        self.assertEqual(bar.n, 4000)
+        self.assertTrue(bar.disable)
+        # all stages were drawn by a single bar.
+        self.assertEqual(self.out.getvalue().count('  0%|'), 1)
+        # a new bar is created for stages registered afterwards.
+        pg.register(10, stage='again', tqdm_args={'file': self.out})
+        self.assertIsNot(pg._prog_rep_state.combined.pg, bar)
+        pg.finish(stage='again')
+
+    def test_combined_stages_picklable(self):
+        import copy
+        import pickle
+        pg = Pipeline()
+        pg.register(10, stage='load', tqdm_args={'file': self.out})
+        pg.register(10, stage='fit', tqdm_args={'file': self.out})
+        pg.update(10, stage='load')
+        pg.finish(stage='load')
+        pg.finish(stage='fit')
+        # the closed bar is dropped with the last stage.
+        self.assertIsNone(pg._prog_rep_state.combined)
+        self.assertIsInstance(pickle.loads(pickle.dumps(pg)), Pipeline)
+        self.assertIsInstance(copy.deepcopy(pg), Pipeline)
+
+    def test_iterate(self):
+        redraws = []
+
+        def call_back(stage, progressbar, **kw):
+            redraws.append(progressbar.n)
+
+        pg = ProgressReporter_()
+        items = pg.iterate(range(1000), description='items', tqdm_args={'file': self.out, 'mininterval': 10})
+        pg.register_progress_callback(call_back)
+        bar = pg._prog_rep_progressbars[0]
+        self.assertEqual(sum(items), sum(range(1000)))
+        # the stage has been finished and callbacks were only called on redraws (and for the final state).
+        self.assertEqual(pg.num_registered, 0)
+        self.assertEqual(bar.n, 1000)
+        self.assertLess(len(redraws), 10)
+        self.assertEqual(redraws[-1], 1000)
+        self.assertIn('1000/1000', self.out.getvalue())
+
+    def test_iterate_break(self):
+        pg = ProgressReporter_()
+        for i in pg.iterate(range(100), tqdm_args={'file': self.out}):
+            if i == 10:
+                break
+        self.assertEqual(pg.num_registered, 0)
+        self.assertIn('100/100', self.out.getvalue())
+        # generators collected before being exhausted.
+        items = pg.iterate(range(100), stage='collected', tqdm_args={'file': self.out})
+        next(items)
+        del items
+        self.assertEqual(pg.num_registered, 0)
+
+    def test_iterate_watched(self):
+        pg = ProgressReporter_()
+        watched = False
+        for _ in pg.iterate(range(10**7), tqdm_args={'file': self.out, 'mininterval': 1e-4}):
+            bar = pg._prog_rep_progressbars[0]
+            if bar._monitored:
+                watched = True
+                break
+        # skipping bars are refreshed by the monitor, once they miss their deadline.
+        self.assertTrue(watched)
+        self.assertFalse(bar._monitored)
+
+    def test_iterate_registered_stage(self):
+        pg = ProgressReporter_()
+        pg.register(10, stage='s', tqdm_args={'file': self.out})
+        bar = pg._prog_rep_progressbars['s']
+        pg.update(4, stage='s')
+        self.assertEqual(list(pg.iterate(iter('abcdef'), stage='s')), list('abcdef'))
+        self.assertEqual(bar.n, 10)
+        self.assertEqual(pg.num_registered, 0)
+        # without length, the amount of work is required.
+        with self.assertRaises(ValueError):
+            pg.iterate(iter('abc'))
+        self.assertEqual(list(pg.iterate(iter('abc'), amount_of_work=3)), list('abc'))
+
+    def test_iterate_counting_stages(self):
+        pg = Pipeline()
+        items = pg.iterate(range(10), tqdm_args={'file': self.out})
+        bar = pg._prog_rep_state.combined.pg
+        self.assertEqual(list(items), list(range(10)))
+        self.assertEqual(bar.n, 1000)
+        self.assertEqual(pg.num_registered, 0)
+        hidden = ProgressReporter_()
+        hidden.show_progress = False
+        self.assertEqual(list(hidden.iterate(iter(range(3)))), [0, 1, 2])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,80 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+from urllib.request import urlopen
+
+from progress_reporter import ProgressReporter_
+from progress_reporter.prometheus import HTTPExporter, TextfileExporter, exposition
+
+from fake_clock import use_clock
+
+
+def metrics(text):
+    # {(name, stage): value} of the samples in text.
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith('#'):
+            continue
+        series, value = line.rsplit(' ', 1)
+        name, labels = series.split('{')
+        labels = dict(label.split('=', 1) for label in labels.rstrip('}').split(','))
+        samples[name, labels['stage'].strip('"')] = float(value)
+    return samples
+
+
+class TestPrometheus(unittest.TestCase):
+
+    def setUp(self):
+        self.pg = ProgressReporter_()
+        self.pg.register(100, description='fit "model"', stage='fit', tqdm_args={'file': StringIO()})
+        bar = self.pg._prog_rep_progressbars['fit']
+        clock = use_clock(bar)
+        clock.t += 2.
+        self.pg.update(50, stage='fit')
+
+    def tearDown(self):
+        self.pg.finish(stage='fit')
+
+    def test_exposition(self):
+        text = exposition()
+        self.assertIn('# TYPE progress_reporter_n gauge', text)
+        self.assertIn('desc="fit \\"model\\""', text)
+        samples = metrics(text)
+        self.assertEqual(samples['progress_reporter_n', 'fit'], 50)
+        self.assertEqual(samples['progress_reporter_total', 'fit'], 100)
+        self.assertEqual(samples['progress_reporter_rate', 'fit'], 25)
+        self.assertEqual(samples['progress_reporter_eta_seconds', 'fit'], 2)
+        self.assertEqual(samples['progress_reporter_elapsed_seconds', 'fit'], 2)
+
+    def test_finished_stages_are_not_exported(self):
+        self.pg.register(10, stage='other', tqdm_args={'file': StringIO()})
+        self.assertIn(('progress_reporter_n', 'other'), metrics(exposition()))
+        self.pg.finish(stage='other')
+        self.assertNotIn(('progress_reporter_n', 'other'), metrics(exposition()))
+
+    def test_textfile(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'progress.prom')
+            with TextfileExporter(path, interval=60):
+                pass
+            with open(path) as f:
+                self.assertEqual(metrics(f.read())['progress_reporter_n', 'fit'], 50)
+            # no temporary files are left behind.
+            self.assertEqual(os.listdir(directory), ['progress.prom'])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_http(self):
+        with HTTPExporter() as exporter:
+            response = urlopen('http://127.0.0.1:{}/metrics'.format(exporter.port))
+            self.assertTrue(response.headers['Content-Type'].startswith('text/plain; version=0.0.4'))
+            self.assertEqual(metrics(response.read().decode('utf-8'))['progress_reporter_n', 'fit'], 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,446 @@
+from __future__ import absolute_import
+
+import gc
+import itertools
+import random
+import re
+import threading
+import time
+import unittest
+from io import StringIO
+from unittest import mock
+
+from progress_reporter import ProgressReporter_
+from progress_reporter._format import compile_meter
+from progress_reporter._vendor.tqdm import tqdm
+from progress_reporter.terminal import _DiffPrinter, _PositionAllocator, _Renderer, my_tqdm
+
+
+class BackgroundReporter(ProgressReporter_):
+    _pg_background_rendering = True
+
+
+class DiffReporter(ProgressReporter_):
+    _pg_diff_rendering = True
+
+
+class TestBackgroundRendering(unittest.TestCase):
+
+    def test_update_does_not_write(self):
+        # avoid the renderer thread to draw on its own during this test.
+        interval = _Renderer.interval
+        _Renderer.interval = 3600
+        self.addCleanup(setattr, _Renderer, 'interval', interval)
+        out = StringIO()
+        pg = BackgroundReporter()
+        pg.register(100, description='background', tqdm_args={'file': out})
+        initial = out.getvalue()
+        with pg.context():
+            for _ in range(50):
+                pg.update(1)
+            # drawing happens in the renderer thread only
+            self.assertEqual(out.getvalue(), initial)
+            self.assertIsNotNone(_Renderer.shared())
+            _Renderer.shared().render()
+            self.assertIn('50/100', out.getvalue())
+        self.assertIn('100/100', out.getvalue())
+        self.assertIsNone(_Renderer.shared())
+
+    def test_renderer_thread(self):
+        out = StringIO()
+        pg = BackgroundReporter()
+        pg.register(10, tqdm_args={'file': out})
+        pg.register(10, stage=1, tqdm_args={'file': out})
+        renderer = _Renderer.shared()
+        self.assertEqual(len(renderer.bars), 2)
+        with pg.context():
+            pg.update(3)
+            time.sleep(5 * renderer.interval)
+            self.assertIn('3/10', out.getvalue())
+        self.assertFalse(renderer.is_alive())
+        self.assertNotIn(renderer, threading.enumerate())
+
+    def test_foreground(self):
+        out = StringIO()
+        pg = ProgressReporter_()
+        pg.register(10, tqdm_args={'file': out, 'mininterval': 0})
+        pg.update(3)
+        self.assertIn('3/10', out.getvalue())
+        self.assertIsNone(_Renderer.shared())
+        pg.finish()
+
+
+class TerminalIO(StringIO):
+    """ emulates the screen of a terminal interpreting the output of progress bars. """
+    _token = re.compile(r'\x1b\[(\d*)([ABCK])|\r|\n|[^\x1b\r\n]+')
+
+    def __init__(self):
+        super(TerminalIO, self).__init__()
+        self.lines = ['']
+        self.row = self.col = 0
+
+    def isatty(self):
+        return True
+
+    def write(self, s):
+        super(TerminalIO, self).write(s)
+        for match in self._token.finditer(s):
+            text, (count, command) = match.group(0), match.groups()
+            count = int(count or 1)
+            if text == '\r':
+                self.col = 0
+            elif text == '\n':
+                self.row, self.col = self.row + 1, 0
+                if self.row == len(self.lines):
+                    self.lines.append('')
+            elif command == 'A':
+                self.row = max(0, self.row - count)
+            elif command == 'B':
+                self.row = min(len(self.lines) - 1, self.row + count)
+            elif command == 'C':
+                self.col += count
+            elif command == 'K':
+                self.lines[self.row] = self.lines[self.row][:self.col]
+            else:
+                line = self.lines[self.row].ljust(self.col)
+                self.lines[self.row] = line[:self.col] + text + line[self.col + len(text):]
+                self.col += len(text)
+        return len(s)
+
+    @property
+    def screen(self):
+        return [line.rstrip() for line in self.lines]
+
+
+class TestDifferentialRendering(unittest.TestCase):
+
+    def setUp(self):
+        # bars of unfinished reporters of other tests would occupy the first rows.
+        gc.collect()
+
+    def test_random_frames(self):
+        rnd = random.Random(42)
+        term = TerminalIO()
+
+        class Bar(object):
+            pos = 0
+
+        bar = Bar()
+        printer = _DiffPrinter(term, bar)
+        frame = ''
+        for _ in range(500):
+            frame = list(frame.ljust(rnd.randint(0, 60)))[:rnd.randint(0, 60)]
+            for _ in range(rnd.randint(0, 8)):
+                if frame:
+                    frame[rnd.randrange(len(frame))] = rnd.choice('ab █▌')
+            frame = ''.join(frame)
+            printer(frame)
+            self.assertEqual(term.screen, [frame.rstrip()])
+
+    def test_escape_sequences(self):
+        term = TerminalIO()
+
+        class Bar(object):
+            pos = 0
+
+        bar = Bar()
+        printer = _DiffPrinter(term, bar)
+        printer('\x1b[1mbold\x1b[0m 1/10')
+        printer('\x1b[1mbold\x1b[0m 2/10')
+        # written as a whole, since the columns are unknown
+        self.assertTrue(term.getvalue().endswith('\r\x1b[1mbold\x1b[0m 2/10'))
+        printer('plain 3/10')
+        printer('plain 4/10')
+        self.assertTrue(term.getvalue().endswith('\r\x1b[6C4'))
+        self.assertEqual(term.screen, ['plain 4/10'])
+
+    def test_writes_changed_columns(self):
+        term = TerminalIO()
+        pg = DiffReporter()
+        pg.register(1000, description='diff', tqdm_args={'file': term, 'mininterval': 0, 'ncols': 80})
+        pg.register(1000, description='other', stage=1, tqdm_args={'file': term, 'mininterval': 0, 'ncols': 80})
+        for _ in range(10):
+            pg.update(1)
+            pg.update(1, stage=1)
+        written = len(term.getvalue())
+        pg.update(1)
+        # only counter, rate and timing columns are written
+        self.assertLess(len(term.getvalue()) - written, 40)
+        self.assertTrue(term.screen[0].startswith('diff:   1%|'))
+        self.assertIn(' 11/1000 ', term.screen[0])
+        self.assertIn(' 10/1000 ', term.screen[1])
+        pg.finish(stage=0)
+        pg.finish(stage=1)
+        self.assertIn('1000/1000', term.screen[0])
+        self.assertIn('1000/1000', term.screen[1])
+
+    def test_other_output(self):
+        # by default, terminals receive whole lines, which survive other output.
+        term = TerminalIO()
+        pg = ProgressReporter_()
+        pg.register(1000, tqdm_args={'file': term, 'mininterval': 0, 'ncols': 80})
+        for _ in range(10):
+            pg.update(1)
+        term.write('log message\n')
+        pg.update(1)
+        self.assertTrue(term.screen[0].endswith('log message'))
+        self.assertTrue(term.screen[1].startswith('  1%|'))
+        self.assertIn(' 11/1000 ', term.screen[1])
+        pg.finish()
+
+    def test_resync(self):
+        term = TerminalIO()
+        pg = DiffReporter()
+        pg.register(1000, tqdm_args={'file': term, 'mininterval': 0, 'ncols': 80})
+        for _ in range(10):
+            pg.update(1)
+        term.write('log message\n')
+        pg.update(1)
+        # the line is garbled by writing the changed columns only ...
+        self.assertFalse(term.screen[1].startswith('  1%|'))
+        # ... until the next frame written as a whole.
+        with mock.patch('progress_reporter.terminal.time', return_value=time.time() + _DiffPrinter.interval):
+            pg.update(1)
+        self.assertTrue(term.screen[1].startswith('  1%|'))
+        self.assertIn(' 12/1000 ', term.screen[1])
+        pg.finish()
+
+    def test_plain_file(self):
+        out = StringIO()
+        pg = ProgressReporter_()
+        pg.register(100, tqdm_args={'file': out, 'mininterval': 0})
+        pg.update(1)
+        pg.update(1)
+        self.assertNotIn('\x1b', out.getvalue())
+        self.assertIn('\r  2%|', out.getvalue())
+        pg.finish()
+
+
+class CountingIO(StringIO):
+    writes = flushes = 0
+
+    def write(self, s):
+        self.writes += 1
+        return super(CountingIO, self).write(s)
+
+    def flush(self):
+        self.flushes += 1
+
+
+class TestFrameComposition(unittest.TestCase):
+
+    def setUp(self):
+        # bars of unfinished reporters of other tests would occupy the first rows.
+        gc.collect()
+
+    def test_renderer_frame(self):
+        interval = _Renderer.interval
+        _Renderer.interval = 3600
+        self.addCleanup(setattr, _Renderer, 'interval', interval)
+        out = CountingIO()
+        pg = BackgroundReporter()
+        for stage in range(4):
+            pg.register(10, description='stage {}'.format(stage), stage=stage, tqdm_args={'file': out})
+        with pg.context():
+            for stage in range(4):
+                pg.update(stage + 1, stage=stage)
+            writes, flushes = out.writes, out.flushes
+            _Renderer.shared().render()
+            # all bars are drawn in a single frame
+            self.assertEqual(out.writes - writes, 1)
+            self.assertEqual(out.flushes - flushes, 1)
+            for stage in range(4):
+                self.assertIn('stage {}:'.format(stage), out.getvalue())
+                self.assertIn(' {}/10 '.format(stage + 1), out.getvalue())
+
+    def test_foreground_frame(self):
+        out = CountingIO()
+        pg = ProgressReporter_()
+        pg.register(10, tqdm_args={'file': out, 'mininterval': 0})
+        pg.register(10, stage=1, tqdm_args={'file': out, 'mininterval': 0})
+        writes = out.writes
+        # moving to the line of the bar, drawing and moving back
+        pg.update(1, stage=1)
+        self.assertEqual(out.writes - writes, 1)
+        self.assertIn(' 1/10 ', out.getvalue())
+        pg.finish(stage=1)
+        pg.finish(stage=0)
+
+    def test_no_frame_without_redraw(self):
+        out = CountingIO()
+        pg = ProgressReporter_()
+        pg.register(1000, tqdm_args={'file': out, 'mininterval': 3600, 'miniters': 1})
+        bar = pg._prog_rep_progressbars[0]
+        writes = out.writes
+        with mock.patch.object(type(bar.fp), 'begin') as begin:
+            for _ in range(100):
+                pg.update(1)
+        # mininterval has not passed, so nothing is drawn and no frame is composed.
+        self.assertEqual(begin.call_count, 0)
+        self.assertEqual(out.writes, writes)
+        pg.finish()
+
+    def test_shared_writer(self):
+        out = StringIO()
+        pg = ProgressReporter_()
+        pg.register(10, tqdm_args={'file': out, 'mininterval': 0})
+        pg.register(10, stage=1, tqdm_args={'file': out, 'mininterval': 0})
+        bars = pg._prog_rep_progressbars
+        self.assertIs(bars[0].fp, bars[1].fp)
+        self.assertEqual(bars[0].fp, out)
+        # tqdm.write clears the bars writing to the same file and redraws them.
+        my_tqdm.write('message', file=out)
+        self.assertIn('message\n', out.getvalue())
+        self.assertIn('0/10', out.getvalue().split('message\n')[1])
+        pg.finish(stage=1)
+        pg.finish(stage=0)
+
+
+class TestPositions(unittest.TestCase):
+
+    def setUp(self):
+        # bars of unfinished reporters of other tests would occupy the first rows.
+        gc.collect()
+
+    class Bar(object):
+        def __init__(self, allocator, position=None):
+            if position is None:
+                self.pos = allocator.acquire(self)
+            else:
+                self.pos = -position
+                allocator.claim(position, self)
+
+    def test_lowest_free_row(self):
+        allocator = _PositionAllocator()
+        bars = [self.Bar(allocator) for _ in range(5)]
+        self.assertEqual([bar.pos for bar in bars], [0, 1, 2, 3, 4])
+        allocator.release(bars[1])
+        # the bars after the released one move up and keep their order.
+        self.assertEqual([bar.pos for bar in bars], [0, 1, 1, 2, 3])
+        allocator.release(bars[4])
+        allocator.release(bars[2])
+        self.assertEqual([bars[0].pos, bars[3].pos], [0, 1])
+        self.assertEqual(allocator.peek(), 2)
+        self.assertEqual(self.Bar(allocator).pos, 2)
+        self.assertEqual(len(allocator), 3)
+
+    def test_fixed_rows(self):
+        allocator = _PositionAllocator()
+        fixed = self.Bar(allocator, position=2)
+        bars = [self.Bar(allocator) for _ in range(3)]
+        self.assertEqual([bar.pos for bar in bars], [0, 1, 3])
+        allocator.release(bars[0])
+        # the fixed bar stays in its row
+        self.assertEqual([fixed.pos, bars[1].pos, bars[2].pos], [-2, 0, 1])
+        allocator.release(fixed)
+        self.assertEqual(self.Bar(allocator).pos, 2)
+
+    def test_random(self):
+        rnd = random.Random(0)
+        allocator = _PositionAllocator()
+        bars = []
+        for _ in range(2000):
+            if bars and rnd.random() < 0.5:
+                allocator.release(bars.pop(rnd.randrange(len(bars))))
+            else:
+                bars.append(self.Bar(allocator))
+            # rows stay compact and in order, like with tqdm
+            self.assertEqual([bar.pos for bar in bars], list(range(len(bars))))
+
+    def test_bars(self):
+        self.assertEqual(len(my_tqdm._positions), 0)
+        out = StringIO()
+        bars = [my_tqdm(total=10, file=out) for _ in range(3)]
+        self.assertEqual([bar.pos for bar in bars], [0, 1, 2])
+        bars[0].close()
+        self.assertEqual([bar.pos for bar in bars[1:]], [0, 1])
+        bars = bars[1:] + [my_tqdm(total=10, file=out)]
+        self.assertEqual(bars[-1].pos, 2)
+        for bar in bars:
+            bar.close()
+        self.assertEqual(len(my_tqdm._positions), 0)
+
+
+class TestMonitor(unittest.TestCase):
+
+    @staticmethod
+    def monitor_threads():
+        return [t for t in threading.enumerate() if t.name == 'progress_reporter monitor']
+
+    def wait_for_exit(self):
+        for _ in range(100):
+            if not self.monitor_threads():
+                return
+            time.sleep(0.01)
+        self.fail('monitor thread still running')
+
+    def test_no_thread(self):
+        bar = my_tqdm(total=10, miniters=1, file=StringIO())
+        bar.update(5)
+        self.assertIsNone(my_tqdm.monitor)
+        self.assertFalse(bar._monitored)
+        self.assertEqual(self.monitor_threads(), [])
+        bar.close()
+
+    def test_stalled_bar(self):
+        out = StringIO()
+        bar = my_tqdm(total=100, miniters=5, maxinterval=0.05, file=out)
+        self.assertTrue(bar._monitored)
+        self.assertEqual(len(self.monitor_threads()), 1)
+        bar.update(1)
+        self.assertNotIn('1/100', out.getvalue())
+        # no further update, only the thread of the monitor can refresh the bar.
+        self.wait_for_exit()
+        # refreshed and the next update is drawn immediately.
+        self.assertIn('1/100', out.getvalue())
+        self.assertEqual(bar.miniters, 1)
+        bar.close()
+
+    def test_close(self):
+        bar = my_tqdm(total=100, miniters=5, maxinterval=3600, file=StringIO())
+        self.assertEqual(len(self.monitor_threads()), 1)
+        bar.close()
+        self.wait_for_exit()
+
+
+class TestCompiledMeter(unittest.TestCase):
+    formats = (None, '{n}/|/{l_bar}{r_bar}', '{desc}: {percentage:3.0f}%|{bar}| {n_fmt}/{total_fmt} {rate_inv_fmt}',
+               '{desc}: {bar} {rate!r} {rate_noinv_fmt} {{literal}}', '{bar}',
+               # not compiled, rendered by tqdm.format_meter
+               '{percentage:.{digits}f}', '{l_bar}{bar:10}{r_bar}', '{bar}{bar}')
+
+    def test_same_as_format_meter(self):
+        def call(fn, *args):
+            try:
+                return fn(*args)
+            except Exception as e:
+                return type(e)
+
+        for bar_format, n, total, elapsed, ncols, prefix, ascii, unit_scale, rate, postfix in itertools.product(
+                self.formats, (0, 5, 100, 150), (None, 100), (0, 10), (None, 0, 40, 80),
+                ('', 'desc', 'desc: ', '\x1b[1mdesc\x1b[0m'), (False, True), (False, True, 2),
+                (None, 0.3, 1000), (None, 'post', {'post': 1})):
+            args = (n, total, elapsed, ncols, prefix, ascii, 'it', unit_scale, rate)
+            self.assertEqual(call(compile_meter(bar_format), *(args + (postfix, 1000))),
+                             call(tqdm.format_meter, *(args + (bar_format, postfix, 1000))))
+
+    def test_computes_used_fields_only(self):
+        with mock.patch('progress_reporter._format._rate_inv_fmt', side_effect=AssertionError):
+            meter = compile_meter('{l_bar}{bar}{n_fmt}')
+            self.assertEqual(meter(1, 10, 20, ncols=20),
+                             tqdm.format_meter(1, 10, 20, ncols=20, bar_format='{l_bar}{bar}{n_fmt}'))
+            with self.assertRaises(AssertionError):
+                compile_meter('{rate_inv_fmt}')(1, 10, 20)
+
+    def test_bar_format(self):
+        out = StringIO()
+        pg = ProgressReporter_()
+        pg.register(10, description='compiled',
+                    tqdm_args={'file': out, 'mininterval': 0, 'bar_format': '{desc}|{n}+{total}'})
+        pg.update(3)
+        self.assertIn('compiled|3+10', out.getvalue())
+        pg.finish()
+
+
+if __name__ == '__main__':
+    unittest.main()